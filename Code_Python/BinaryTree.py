@@ -11,9 +11,50 @@ Notes
 - Five search methods: pre-order, post-order, in-order, using a stack, and
   using a queue.
 - Possible to search the entire tree or only a specific sub-tree.
+- Possible to limit searches, traversals, and node information to a maximum
+  depth and/or number of nodes, to sample nodes, and to estimate the size of
+  a tree without visiting all nodes.
+- Possible to search many values with a single traversal.
 - Possible to add/insert a single node or a sub-tree.
 - Possible to specify the value or the node object (in some of the methods).
 - Possible to create a new tree from a given sub-tree.
+- Range, path, and nearest value queries on ordered trees (left sub-tree
+  values <= node value <= right sub-tree values) visit only the branches
+  that can contain the result.
+- Possible to copy a tree/sub-tree. Copies and pickles are made using flat
+  lists (no recursion), so they work with trees of any depth.
+- In-order traversals move along the parent links (as in a threaded tree),
+  so they need no stack/recursion and cost O(1) amortized per step. The
+  parent links are set by the node constructor, the node set methods, and
+  the binary tree methods (not if the node attributes are changed directly).
+- Each node caches the hash (128-bit BLAKE2 digest) of its sub-tree. The
+  cache is cleared along the parent chain when a node is changed using its
+  set methods (or the binary tree methods), so comparing trees/sub-trees
+  only visits the changed paths. Number of nodes and height are cached in
+  the same way.
+- Values of type int, float, bool, str, bytes, and None are hashed exactly,
+  so sub-trees with only these values are identical if their hashes are the
+  same. Sub-trees with other values are hashed using the Python hash of the
+  values (all the same if they cannot be hashed, like lists) and compared
+  node by node when the hashes are the same. Values of different types are
+  taken as different, except int, float, and bool (so 1 == 1.0 == True).
+- Binary trees compare by value and are not hashable. Sub-trees are found
+  using an index of the sub-tree hashes, updated only with the changed
+  paths.
+- Short string representations (used by <repr>) do not visit the tree.
+- Optional operation log (see <TreeLog.py>) recording all changes made using
+  the binary tree methods, for crash-safe incremental persistence.
+- Optional node pool to recycle the nodes removed from a binary tree. The
+  nodes removed with <release=True> (by <remove()> or <clear()>) are reused
+  for new nodes, so they must not be used anymore by the caller.
+- The differences between two binary trees can be returned as a list of
+  operations (edit script) and applied to another binary tree. A node is
+  identified by its path from the root, a string with 'L' (left) and 'R'
+  (right) for each level ('' is the root).
+- Removed sub-trees can be unlinked node by node, so they are freed at once
+  instead of leaving parent/child reference cycles to the garbage collector.
+  With <gc_mode='off'> the collector is disabled while nodes are removed.
+- Can be imported from the package (folder) or directly from inside it.
 - Examples of usage are in <test_BinaryTree.py>.
 - Reference: "Problem Solving with Algorithms and Data Structures", by Miller
   and Ranum.
@@ -26,7 +67,10 @@ right               Linked right node.
 left                Linked left node.
 parent              Linked parent node.
 __init__()          Initializes the node and its linked nodes.
-__repr__()          Returns the string representation of the node.
+__repr__()          Returns the short string representation of the node.
+__str__()           Returns the string representation of the node.
+__copy__()          Returns a shallow copy of the node.
+__reduce__()        Returns the node data for pickling/deep copying.
 set_value()         Sets/replaces the content of the node.
 get_value()         Returns the content of the node.
 set_right()         Sets/replaces the linked right node.
@@ -35,13 +79,39 @@ set_left()          Sets/replaces the linked left node.
 get_left()          Returns the linked left node.
 set_parent()        Sets/replaces the linked parent node.
 get_parent()        Returns the linked parent node.
+subtree_hash()      Returns the (cached) hash of the sub-tree.
+subtree_info()      Returns the (cached) number of nodes and height.
+_uncached()         Returns the nodes of the sub-tree without a cached value.
+_invalidate()       Clears the cached values of the node and its ancestors.
+
+
+NodePool Class
+--------------
+nodes               List with the recycled nodes.
+max_size            Maximum number of recycled nodes (None for no limit).
+__init__()          Initializes the node pool.
+__repr__()          Returns the string representation of the node pool.
+acquire()           Returns a new/recycled node.
+release()           Recycles all nodes of a sub-tree.
 
 
 BinaryTree Class
 ----------------
 root                Node at the root.
+pool                Node pool used to create the nodes (None for no pool).
+gc_mode             Garbage collector mode during removals ('auto' or 'off').
+log                 Operation log recording the changes (None for no log).
+_index              Index of the sub-tree hashes (None until first used).
+_index_nodes        Hashes of the nodes in the index.
+_index_size         Number of nodes in the index.
+_index_stamp        Hash stamp of the last index update.
 __init__()          Initializes the binary tree with a root node.
-__repr__()          Returns the string representation of the binary tree.
+__repr__()          Returns the short string representation of the tree.
+__str__()           Returns the string representation of the binary tree.
+__eq__()            Checks if two binary trees are identical.
+__contains__()      Checks if a value/sub-tree is in the binary tree.
+__getstate__()      Returns the binary tree data for pickling/copying.
+summary()           Returns the string representation with/without stats.
 is_empty()          Checks if the binary tree is empty or not.
 add_left()          Adds/inserts the left node of a parent.
 add_right()         Adds/inserts the right node of a parent.
@@ -51,23 +121,65 @@ is_leaf()           Checks if a node is a leaf or not.
 search()            Searches the entire binary tree for a specific value.
 search_pre()        Searches the binary tree using pre-order (recursive).
 search_post()       Searches the binary tree using post-order (recursive).
-search_in()         Searches the binary tree using in-order (recursive).
+search_in()         Searches the binary tree using in-order (iterative).
 search_stack()      Searches the binary tree using a stack (iterative).
-search_queue()      Searches the binary tree using a queue (iterative).
+search_queue()      Searches the binary tree level by level (iterative).
+search_batch()      Searches the binary tree for many values at once.
 change()            Changes a value in the binary tree to another.
 remove()            Removes a value/node/sub-tree from the binary tree.
+iter_range()        Yields the nodes in a range of values (ordered trees).
+path()              Returns the nodes from the root to a value (ordered trees).
+nearest()           Returns the node with the nearest value (ordered trees).
+copy()              Returns a copy of the binary tree.
+copy_subtree()      Returns a copy of a sub-tree.
+node_at()           Returns the node at a given path.
+diff()              Returns the edit script from a binary tree to another.
+apply_patch()       Applies an edit script to the binary tree.
+_new_node()         Returns a new node (from the node pool if defined).
+_discard()          Recycles/unlinks the nodes of a removed sub-tree.
+_attach_at()        Adds a sub-tree at a given path.
+_patch_node()       Returns the node at a given path of an edit script.
+_indexed()          Returns the nodes with a given sub-tree hash.
 
 
 Helper Functions
 ----------------
 node_info()         Returns the node information in a list.
+node_info_batch()   Returns the information of many nodes in four lists.
 tree_info()         Returns the number of nodes and height of a tree/sub-tree.
+iter_levels()       Yields the nodes of a tree/sub-tree one level at a time.
 tree_nodes()        Returns all node information of a tree/sub-tree.
+iter_in()           Yields the nodes of a tree/sub-tree using in-order.
+iter_nodes()        Yields the nodes of a tree/sub-tree in the search order.
+sample_nodes()      Returns a random sample of nodes of a tree/sub-tree.
+tree_estimate()     Estimates the number of nodes and height of a tree.
+successor()         Returns the in-order successor of a node.
+predecessor()       Returns the in-order predecessor of a node.
+is_same_tree()      Checks if two trees/sub-trees are identical.
+intern_subtree()    Returns the shared copy of a sub-tree from a table.
+flatten_subtree()   Returns the values and shape of a tree/sub-tree.
+build_subtree()     Builds a tree/sub-tree from its values and shape.
+unlink_subtree()    Clears all links in a tree/sub-tree.
+gc_paused()         Context manager disabling the garbage collector.
 """
 
 
-from Stack import Stack
-from Queue import Queue
+import gc
+from itertools import count, islice
+
+# Relative imports when used as a package, plain imports when used from
+# inside the folder
+try:
+    from .Stack import Stack
+except ImportError:
+    from Stack import Stack
+
+
+# No depth limit
+_INF = float('inf')
+
+# Stamps of the sub-tree hashes (increasing)
+_stamps = count(1)
 
 
 def node_info(node):
@@ -96,72 +208,570 @@ def node_info(node):
     return [node_value, left_value, right_value, parent_value]
 
 
-def tree_info(node):
+def node_info_batch(nodes):
     """
-    Returns the number of nodes and the height of the sub-tree starting at
-    <node>.
+    Returns the information of the specified nodes as a tuple of four lists
+    (values, left child values, right child values, parent values).
     """
-    # Initialize the queue
-    queue = Queue()
+    values = []
+    left_values = []
+    right_values = []
+    parent_values = []
 
-    # Add the root node and its level to the queue
-    queue.enqueue((node, 0))
+    for node in nodes:
+        values.append(node.value)
+        left_values.append(None if (node.left is None) else node.left.value)
+        right_values.append(None if (node.right is None) else node.right.value)
+        parent_values.append(None if (node.parent is None)
+                             else node.parent.value)
 
-    # Loop until the queue is empty
+    return values, left_values, right_values, parent_values
+
+
+def tree_info(node, max_depth=None, max_nodes=None):
+    """
+    Returns the number of nodes and the height of the sub-tree starting at
+    <node>. If specified, only the first <max_nodes> nodes (level by level)
+    down to depth <max_depth> (the root is at depth 0) are counted.
+    """
     size = 0
-    height = 0
-    while (not queue.is_empty()):
+    height = -1
 
-        # Get the last node from the queue
-        node, level = queue.dequeue()
-        size += 1
+    # Process the sub-tree one level at a time
+    for level in iter_levels(node, max_depth=max_depth):
 
-        # If it has a left child put it in the queue with its level
-        left_child = node.get_left()
-        if (left_child is not None):
-            queue.enqueue((left_child, level+1))
-            height = max(height, level+1)
+        # Stop at the maximum number of nodes
+        if (max_nodes is not None):
+            level = level[:max_nodes-size]
+            if (not level):
+                break
 
-        # If it has a right child put it in the queue with its level
-        right_child = node.get_right()
-        if (right_child is not None):
-            queue.enqueue((right_child, level+1))
-            height = max(height, level+1)
+        size += len(level)
+        height += 1
 
     return size, height
 
 
-def tree_nodes(node):
+def iter_levels(node, max_depth=None):
+    """
+    Yields, one level at a time, the nodes of the tree/sub-tree starting at
+    <node> (down to depth <max_depth> if specified). Each level is returned as
+    a list (from left to right) and only the current and the next level are
+    kept in memory.
+    """
+    level = [node]
+    depth = 0
+
+    # Loop until there are no more levels
+    while (level):
+
+        yield level
+
+        # Stop at the maximum depth
+        if (depth == max_depth):
+            return
+        depth += 1
+
+        # Build the next level from the children of the current one
+        next_level = []
+        for node in level:
+
+            # If it has a left child add it to the next level
+            if (node.left is not None):
+                next_level.append(node.left)
+
+            # If it has a right child add it to the next level
+            if (node.right is not None):
+                next_level.append(node.right)
+
+        level = next_level
+
+
+def tree_nodes(node, max_depth=None, max_nodes=None):
     """
     Returns in a list of lists the node information in the tree/sub-tree
-    starting at <node>.
+    starting at <node>. If specified, only the first <max_nodes> nodes (level
+    by level) down to depth <max_depth> are returned.
     """
-    node_list = []
+    nodes = iter_nodes(node, max_depth=max_depth, max_nodes=max_nodes)
+
+    return [node_info(node) for node in nodes]
+
 
-    # Initialize the queue
-    queue = Queue()
+def iter_in(node, max_depth=None):
+    """
+    Yields the nodes of the tree/sub-tree starting at <node> using in-order
+    (down to depth <max_depth> if specified). The nodes are reached following
+    the parent links, so no stack is used. The tree/sub-tree should not be
+    changed during the iteration.
+    """
+    root = node
+    depth = 0
+    limit = _INF if (max_depth is None) else max_depth
 
-    # Add the root node and its level to the queue
-    queue.enqueue(node)
+    # Start from the leftmost node
+    while (depth < limit and node.left is not None):
+        node = node.left
+        depth += 1
 
-    # Loop until the queue is empty
-    while (not queue.is_empty()):
+    while (True):
 
-        # Get the last node from the queue and append its info
-        node = queue.dequeue()
-        node_list.append(node_info(node))
+        yield node
 
-        # If it has a left child put it in the queue
-        left_child = node.get_left()
-        if (left_child is not None):
-            queue.enqueue(left_child)
+        # Next node is the leftmost node of the right sub-tree
+        if (depth < limit and node.right is not None):
+            node = node.right
+            depth += 1
+            while (depth < limit and node.left is not None):
+                node = node.left
+                depth += 1
+
+        # Otherwise go up until coming from a left sub-tree
+        else:
+            while (node is not root and node.parent.right is node):
+                node = node.parent
+                depth -= 1
+
+            # All nodes have been visited
+            if (node is root):
+                return
+
+            node = node.parent
+            depth -= 1
+
+
+def iter_nodes(node, order='queue', max_depth=None, max_nodes=None):
+    """
+    Returns an iterator over the nodes of the tree/sub-tree starting at <node>
+    in the same order they are checked by the corresponding search method. If
+    specified, only the first <max_nodes> nodes down to depth <max_depth> are
+    returned.
+    """
+    nodes = _iter_order(node, order, max_depth)
+
+    # Stop at the maximum number of nodes
+    if (max_nodes is not None):
+        nodes = islice(nodes, max_nodes)
+
+    return nodes
+
+
+def _iter_order(node, order, max_depth):
+    """
+    Yields the nodes of the tree/sub-tree starting at <node> in the specified
+    order down to depth <max_depth> (no limit if <None>).
+    """
+    limit = _INF if (max_depth is None) else max_depth
+
+    # Pre-order (using a stack with the node depths)
+    if (order == 'pre'):
+        stack = [node]
+        depths = [0]
+        while (stack):
+            node = stack.pop()
+            depth = depths.pop()
+            yield node
+            if (depth < limit):
+                if (node.right is not None):
+                    stack.append(node.right)
+                    depths.append(depth + 1)
+                if (node.left is not None):
+                    stack.append(node.left)
+                    depths.append(depth + 1)
+
+    # Post-order (following the parent links)
+    elif (order == 'post'):
+        root = node
+        depth = 0
+        while (True):
+
+            # Go down to the first node without children
+            while (depth < limit
+                   and (node.left is not None or node.right is not None)):
+                node = node.left if (node.left is not None) else node.right
+                depth += 1
+
+            yield node
+
+            # Go up yielding the parents until there is a right sub-tree
+            while (node is not root):
+                parent = node.parent
+                if (parent.left is node and parent.right is not None):
+                    node = parent.right
+                    break
+                node = parent
+                depth -= 1
+                yield node
+
+            # All nodes have been visited
+            else:
+                return
+
+    # In-order (following the parent links)
+    elif (order == 'in'):
+        yield from iter_in(node, max_depth=max_depth)
+
+    # Using a stack (LIFO order) with the node depths
+    elif (order == 'stack'):
+        stack = [node]
+        depths = [0]
+        while (stack):
+            node = stack.pop()
+            depth = depths.pop()
+            yield node
+            if (depth < limit):
+                if (node.left is not None):
+                    stack.append(node.left)
+                    depths.append(depth + 1)
+                if (node.right is not None):
+                    stack.append(node.right)
+                    depths.append(depth + 1)
+
+    # Level by level (FIFO order) - default
+    else:
+        for level in iter_levels(node, max_depth=max_depth):
+            yield from level
+
+
+def successor(node, root=None):
+    """
+    Returns the node following <node> using in-order. Returns <None> if
+    <node> is the last one (of the sub-tree starting at <root> if specified).
+    """
+    # Leftmost node of the right sub-tree
+    if (node.right is not None):
+        node = node.right
+        while (node.left is not None):
+            node = node.left
+        return node
+
+    # First ancestor reached from its left sub-tree (inside <root>)
+    while (node is not root and node.parent is not None
+           and node.parent.right is node):
+        node = node.parent
+
+    if (node is root):
+        return None
+
+    return node.parent
+
+
+def predecessor(node, root=None):
+    """
+    Returns the node preceding <node> using in-order. Returns <None> if
+    <node> is the first one (of the sub-tree starting at <root> if specified).
+    """
+    # Rightmost node of the left sub-tree
+    if (node.left is not None):
+        node = node.left
+        while (node.right is not None):
+            node = node.right
+        return node
+
+    # First ancestor reached from its right sub-tree (inside <root>)
+    while (node is not root and node.parent is not None
+           and node.parent.left is node):
+        node = node.parent
+
+    if (node is root):
+        return None
+
+    return node.parent
+
+
+def sample_nodes(node, k, max_depth=None, max_nodes=None, rng=None):
+    """
+    Returns a random sample (reservoir sampling) of <k> nodes from the tree/
+    sub-tree starting at <node>. If specified, only the first <max_nodes> nodes
+    (level by level) down to depth <max_depth> are sampled. <rng> is the
+    random number generator (module <random> if not specified).
+    """
+    if (rng is None):
+        import random as rng
+
+    sample = []
+    nodes = iter_nodes(node, max_depth=max_depth, max_nodes=max_nodes)
+    for i, node in enumerate(nodes):
+
+        # Fill the reservoir
+        if (i < k):
+            sample.append(node)
+
+        # Replace a node with probability k / (i + 1)
+        else:
+            j = rng.randrange(i + 1)
+            if (j < k):
+                sample[j] = node
+
+    return sample
+
+
+def tree_estimate(node, probes=16, rng=None):
+    """
+    Returns an estimate of the number of nodes and of the height of the
+    tree/sub-tree starting at <node>, using <probes> random walks from <node>
+    to a leaf (Knuth's estimator). The cost does not depend on the number of
+    nodes. <rng> is the random number generator (module <random> if not
+    specified).
+    """
+    if (rng is None):
+        import random as rng
+
+    total = 0
+    height = 0
+    for _ in range(probes):
+
+        # Walk down choosing a random child
+        size = 1
+        width = 1
+        depth = 0
+        child = node
+        while (True):
+
+            children = [n for n in (child.left, child.right) if n is not None]
+            if (not children):
+                break
+
+            # Each node at this depth is assumed to have the same children
+            width *= len(children)
+            size += width
+            depth += 1
+            child = rng.choice(children)
+
+        total += size
+        height = max(height, depth)
+
+    return round(total / probes), height
+
+
+def is_same_tree(node_a, node_b):
+    """
+    Returns <True> if the sub-trees starting at <node_a> and <node_b> have the
+    same structure and values and <False> if they do not. Sub-trees with
+    different hashes are rejected, and sub-trees with the same exact hash are
+    accepted, without visiting them.
+    """
+    # Different hashes means different sub-trees
+    if (node_a.subtree_hash() != node_b.subtree_hash()):
+        return False
+
+    # Same hashes are confirmed node by node where they are not exact
+    pairs = [(node_a, node_b)]
+    while (pairs):
+
+        node_a, node_b = pairs.pop()
+
+        # Same node (or both missing)
+        if (node_a is node_b):
+            continue
+
+        # Only one node missing, or different hashes
+        if (node_a is None or node_b is None
+                or node_a._hash != node_b._hash):
+            return False
+
+        # Same exact hashes means identical sub-trees
+        if (node_a._hash[0]):
+            continue
+
+        # Different values
+        if (node_a.value != node_b.value):
+            return False
+
+        pairs.append((node_a.left, node_b.left))
+        pairs.append((node_a.right, node_b.right))
+
+    return True
+
+
+def _value_bytes(value):
+    """
+    Returns the bytes representing <value> in the sub-tree hashes and <True>
+    if they are exact (the same only for equal values).
+    """
+    kind = type(value)
+
+    # Integers (floats with an integer value are equal to them)
+    if (kind is int or kind is bool):
+        return b'i%d' % value, True
+
+    elif (kind is float):
+        if (value.is_integer()):
+            return b'i%d' % value, True
+        if (value == value):
+            return b'f' + repr(value).encode(), True
+
+    elif (kind is str):
+        return b's' + value.encode('utf-8', 'surrogatepass'), True
 
-        # If it has a right child put it in the queue
-        right_child = node.get_right()
+    elif (kind is bytes):
+        return b'b' + value, True
+
+    elif (value is None):
+        return b'n', True
+
+    # Other values (and NaN) use their Python hash, if they have one
+    try:
+        return b'h%d' % hash(value), False
+    except TypeError:
+        return b'u', False
+
+
+def intern_subtree(node, table):
+    """
+    Returns the sub-tree in <table> identical to the one starting at <node>,
+    adding <node> to <table> if there is none. <table> is a dictionary
+    mapping hashes to lists of sub-trees and can be shared among trees (for
+    instance snapshots of the same tree) to deduplicate their sub-trees.
+    """
+    bucket = table.setdefault(node.subtree_hash(), [])
+
+    # Return the identical sub-tree if already in the table
+    for other in bucket:
+        if (is_same_tree(node, other)):
+            return other
+
+    # Otherwise add it to the table
+    bucket.append(node)
+
+    return node
+
+
+def flatten_subtree(node):
+    """
+    Returns the values (using pre-order) and the shape of the tree/sub-tree
+    starting at <node>. The shape is a <bytes> object with, for each node, 1
+    if it has a left child plus 2 if it has a right child.
+    """
+    values = []
+    shape = bytearray()
+
+    # Visit the sub-tree using a stack
+    stack = [node]
+    while (stack):
+
+        node = stack.pop()
+        left_child = node.left
+        right_child = node.right
+
+        # Save value and shape
+        values.append(node.value)
+        shape.append((left_child is not None) + 2 * (right_child is not None))
+
+        # Put the children in the stack (left is visited first)
         if (right_child is not None):
-            queue.enqueue(right_child)
+            stack.append(right_child)
+        if (left_child is not None):
+            stack.append(left_child)
+
+    return values, bytes(shape)
+
+
+def build_subtree(values, shape):
+    """
+    Returns the root node of a new tree/sub-tree built from the values and
+    shape returned by <flatten_subtree>.
+    """
+    root = None
+
+    # Positions (parent and side) still waiting for a node
+    slots = []
+
+    for value, flags in zip(values, shape):
+
+        # Create the node and attach it to the next position
+        if (root is None):
+            node = root = BTnode(value)
+        else:
+            parent, side = slots.pop()
+            node = BTnode(value, parent=parent)
+            if (side == 'left'):
+                parent.left = node
+            else:
+                parent.right = node
+
+        # Add its children positions (left is filled first)
+        if (flags & 2):
+            slots.append((node, 'right'))
+        if (flags & 1):
+            slots.append((node, 'left'))
+
+    return root
+
+
+def _descend(node, path):
+    """
+    Returns the node at the specified path from <node>. Returns <None> if there
+    is no node at that path.
+    """
+    for step in path:
+
+        if (node is None):
+            break
 
-    return node_list
+        node = node.left if (step == 'L') else node.right
+
+    return node
+
+
+def unlink_subtree(node):
+    """
+    Clears all links (left, right, and parent) of the nodes in the tree/
+    sub-tree starting at <node> and returns the number of nodes. Without
+    reference cycles the nodes are freed as soon as they are not used anymore.
+    """
+    count = 0
+
+    # Visit the sub-tree using a stack
+    stack = [node]
+    while (stack):
+
+        node = stack.pop()
+        count += 1
+
+        # Put the children in the stack
+        if (node.left is not None):
+            stack.append(node.left)
+        if (node.right is not None):
+            stack.append(node.right)
+
+        # Clear the links
+        node.left = None
+        node.right = None
+        node.parent = None
+        node._hash = None
+        node._info = None
+
+    return count
+
+
+class gc_paused:
+    """
+    Context manager disabling (if <pause> is <True>) the garbage collector and
+    restoring its previous state on exit. Written as a class to avoid importing
+    <contextlib> (and its dependencies) at start-up.
+    """
+    def __init__(self, pause=True):
+        """
+        Initializes the context manager.
+        """
+        self.pause = pause
+        self.enabled = None
+
+    def __enter__(self):
+        """
+        Disables the garbage collector.
+        """
+        self.enabled = gc.isenabled()
+        if (self.pause):
+            gc.disable()
+
+    def __exit__(self, *exc_info):
+        """
+        Restores the garbage collector previous state.
+        """
+        if (self.pause and self.enabled):
+            gc.enable()
 
 
 class BTnode:
@@ -171,16 +781,31 @@ class BTnode:
     def __init__(self, value, left=None, right=None, parent=None):
         """
         Initializes the node content and (if specified) the linked left, right,
-        and parent nodes.
+        and parent nodes. The node becomes the parent of its children.
         """
         self.value = value
         self.left = left
         self.right = right
         self.parent = parent
+        self._hash = None
+        self._info = None
+        self._stamp = 0
+
+        # Link the children to the node
+        if (left is not None):
+            left.parent = self
+        if (right is not None):
+            right.parent = self
 
     def __repr__(self):
         """
-        Returns the string representation of the node.
+        Returns the short string representation of the node.
+        """
+        return "BTnode({!r})".format(self.value)
+
+    def __str__(self):
+        """
+        Returns the string representation of the node with its linked nodes.
         """
         info = node_info(self)
         return ("\nBTnode object \
@@ -190,11 +815,40 @@ class BTnode:
                  \n- parent value = {}" \
                 .format(info[0], info[1], info[2], info[3]))
 
+    def __copy__(self):
+        """
+        Returns a shallow copy of the node, with the same value and linked
+        nodes (which are not copied).
+        """
+        return BTnode(self.value, left=self.left, right=self.right,
+                      parent=self.parent)
+
+    def __reduce__(self):
+        """
+        Returns the data to pickle/deep copy the node. The entire tree the node
+        belongs to is saved (as flat lists), and the node is found again using
+        its path from the root.
+        """
+        # Find the root and the path from it
+        root = self
+        path = []
+        while (root.parent is not None):
+            path.append('L' if (root.parent.left is root) else 'R')
+            root = root.parent
+
+        # The root is rebuilt from its values and shape
+        if (root is self):
+            return (build_subtree, flatten_subtree(self))
+
+        # Any other node is taken from the (rebuilt) root
+        return (_descend, (root, ''.join(reversed(path))))
+
     def set_value(self, value):
         """
         Sets/replaces the content of the node.
         """
         self.value = value
+        self._invalidate()
 
     def get_value(self):
         """
@@ -204,9 +858,12 @@ class BTnode:
 
     def set_left(self, left):
         """
-        Sets/replaces the linked left node.
+        Sets/replaces the linked left node (the node becomes its parent).
         """
         self.left = left
+        if (left is not None):
+            left.parent = self
+        self._invalidate()
 
     def get_left(self):
         """
@@ -216,9 +873,12 @@ class BTnode:
 
     def set_right(self, right):
         """
-        Sets/replaces the linked right node.
+        Sets/replaces the linked right node (the node becomes its parent).
         """
         self.right = right
+        if (right is not None):
+            right.parent = self
+        self._invalidate()
 
     def get_right(self):
         """
@@ -238,16 +898,224 @@ class BTnode:
         """
         return self.parent
 
+    def subtree_hash(self):
+        """
+        Returns the hash of the sub-tree starting at the node. Hashes are
+        cached and only the nodes without a cached hash are visited. The hash
+        is a 17-byte <bytes> object: 1 if it is exact (only values hashed
+        exactly) or 0, followed by the 128-bit digest of the value and of the
+        children hashes.
+        """
+        if (self._hash is None):
+
+            # Imported only when needed (faster start-up)
+            from hashlib import blake2b
+
+            # Hash the children before their parent (all with the same stamp)
+            stamp = next(_stamps)
+            for node in reversed(self._uncached('_hash')):
+
+                data, exact = _value_bytes(node.value)
+
+                # Which children and their hashes
+                left = node.left
+                right = node.right
+                if (left is None):
+                    if (right is None):
+                        children = b'\x00'
+                    else:
+                        children = b'\x02' + right._hash
+                        exact = exact and right._hash[0]
+                elif (right is None):
+                    children = b'\x01' + left._hash
+                    exact = exact and left._hash[0]
+                else:
+                    children = b'\x03' + left._hash + right._hash
+                    exact = exact and left._hash[0] and right._hash[0]
+
+                digest = blake2b(children + data, digest_size=16).digest()
+                node._hash = (b'\x01' if exact else b'\x00') + digest
+                node._stamp = stamp
+
+        return self._hash
+
+    def subtree_info(self):
+        """
+        Returns the number of nodes and the height of the sub-tree starting at
+        the node. Results are cached and only the nodes without a cached result
+        are visited.
+        """
+        if (self._info is None):
+
+            # Process the children before their parent
+            for node in reversed(self._uncached('_info')):
+
+                left = node.left
+                right = node.right
+
+                # Leaf
+                if (left is None and right is None):
+                    node._info = (1, 0)
+
+                # Only one child
+                elif (left is None or right is None):
+                    size, height = (right if (left is None) else left)._info
+                    node._info = (size + 1, height + 1)
+
+                # Both children
+                else:
+                    left_size, left_height = left._info
+                    right_size, right_height = right._info
+                    height = left_height if (left_height > right_height) \
+                        else right_height
+                    node._info = (left_size + right_size + 1, height + 1)
+
+        return self._info
+
+    def _uncached(self, name):
+        """
+        Returns (level by level) the nodes of the sub-tree starting at the node
+        without a cached value in the attribute <name>. Sub-trees with a cached
+        value are not visited.
+        """
+        nodes = []
+
+        # Process the sub-tree one level at a time
+        level = [self]
+        while (level):
+
+            nodes.extend(level)
+
+            # Build the next level with the children without a cached value
+            next_level = []
+            for node in level:
+
+                left = node.left
+                if (left is not None and getattr(left, name) is None):
+                    next_level.append(left)
+
+                right = node.right
+                if (right is not None and getattr(right, name) is None):
+                    next_level.append(right)
+
+            level = next_level
+
+        return nodes
+
+    def _invalidate(self):
+        """
+        Clears the cached hash and information of the node and of its
+        ancestors. The loop stops at the first node without cached values, as
+        its ancestors cannot have them either.
+        """
+        node = self
+        while (node is not None
+               and (node._hash is not None or node._info is not None)):
+            node._hash = None
+            node._info = None
+            node = node.parent
+
+
+class NodePool:
+    """
+    Node pool class.
+    """
+    def __init__(self, max_size=None):
+        """
+        Initializes the node pool. At most <max_size> recycled nodes are kept
+        (no limit if <None>).
+        """
+        self.nodes = []
+        self.max_size = max_size
+
+    def __repr__(self):
+        """
+        Returns the string representation of the node pool.
+        """
+        return ("\nNodePool object \
+                 \n- recycled nodes = {} \
+                 \n- max size = {}" \
+                .format(len(self.nodes), self.max_size))
+
+    def acquire(self, value, left=None, right=None, parent=None):
+        """
+        Returns a node with the specified content and linked nodes, reusing a
+        recycled node if there is any.
+        """
+        # Create a new node if the pool is empty
+        if (not self.nodes):
+            return BTnode(value, left=left, right=right, parent=parent)
+
+        # Reuse the last recycled node (linking its children to it)
+        node = self.nodes.pop()
+        node.value = value
+        node.left = left
+        node.right = right
+        node.parent = parent
+        if (left is not None):
+            left.parent = node
+        if (right is not None):
+            right.parent = node
+
+        return node
+
+    def release(self, node):
+        """
+        Recycles all nodes of the (already detached) sub-tree starting at
+        <node> and returns the number of recycled nodes. All links are cleared,
+        including the ones of the nodes exceeding the pool size.
+        """
+        nodes = self.nodes
+        max_size = self.max_size
+        count = 0
+
+        # Visit the sub-tree using a stack
+        stack = [node]
+        while (stack):
+
+            node = stack.pop()
+
+            # Put the children in the stack
+            if (node.left is not None):
+                stack.append(node.left)
+            if (node.right is not None):
+                stack.append(node.right)
+
+            # Clear the node
+            node.value = None
+            node.left = None
+            node.right = None
+            node.parent = None
+            node._hash = None
+            node._info = None
+
+            # Recycle the node if the pool is not full
+            if (max_size is None or len(nodes) < max_size):
+                nodes.append(node)
+                count += 1
+
+        return count
+
 
 class BinaryTree:
     """
     Binary tree class
     """
-    def __init__(self, data):
+    def __init__(self, data, pool=None, gc_mode='auto'):
         """
         Initializes the binary tree with an already existing node object <data >
-        or creating a new one with value equal to <data>.
+        or creating a new one with value equal to <data>. If specified, the
+        nodes are created using the node pool <pool>. If <gc_mode> is 'off'
+        the garbage collector is disabled while nodes are removed.
         """
+        self.pool = pool
+        self.gc_mode = gc_mode
+        self.log = None
+        self._index = None
+        self._index_nodes = None
+        self._index_size = 0
+        self._index_stamp = -1
+
         # If <data> is a node
         if (isinstance(data, BTnode)):
             self.root = data
@@ -255,19 +1123,85 @@ class BinaryTree:
 
         # If <data> is a value
         else:
-            self.root = BTnode(data)
+            self.root = self._new_node(data)
 
     def __repr__(self):
+        """
+        Returns the short string representation of the binary tree.
+        """
+        return self.summary()
+
+    def __str__(self):
         """
         Returns the string representation of the binary tree.
         """
-        size, height = tree_info(self.root)
+        return self.summary(verbose=True)
+
+    def summary(self, verbose=False):
+        """
+        Returns the string representation of the binary tree. Size and height
+        are computed only if <verbose> is <True>, otherwise they are shown only
+        if already known (cached).
+        """
+        if (verbose or self.root._info is not None):
+            size, height = self.root.subtree_info()
+        else:
+            size = height = 'unknown'
+
         return ("\nBinary tree object \
                  \n- root value = {} \
                  \n- size = {} \
                  \n- height = {}" \
                 .format(self.root.get_value(), size, height))
 
+    def __eq__(self, other):
+        """
+        Returns <True> if the two binary trees have the same structure and
+        values and <False> if they do not.
+        """
+        if (not isinstance(other, BinaryTree)):
+            return NotImplemented
+
+        return is_same_tree(self.root, other.root)
+
+    # Binary trees are mutable and compared by value
+    __hash__ = None
+
+    def __getstate__(self):
+        """
+        Returns the data to pickle/copy the binary tree (the operation log and
+        the index of the sub-tree hashes are not included).
+        """
+        state = self.__dict__.copy()
+        state['log'] = None
+        state['_index'] = None
+        state['_index_nodes'] = None
+        state['_index_size'] = 0
+
+        return state
+
+    def __contains__(self, data):
+        """
+        Returns <True> if the binary tree contains the specified value or an
+        identical copy of the specified node/binary tree sub-tree, and <False>
+        if it does not. Sub-trees are found using the index of the sub-tree
+        hashes.
+        """
+        # If <data> is a binary tree use its root
+        if (isinstance(data, BinaryTree)):
+            data = data.root
+
+        # If <data> is a value search for it
+        if (not isinstance(data, BTnode)):
+            return (self.search(data) is not None)
+
+        # Compare only the sub-trees with the same hash
+        for node in self._indexed(data.subtree_hash()):
+            if (is_same_tree(node, data)):
+                return True
+
+        return False
+
     def is_empty(self):
         """
         Returns <True> if the binary tree is empty (only the root node) and
@@ -283,7 +1217,7 @@ class BinaryTree:
         """
         # If no left node is defined
         if (parent.left is None):
-            new_node = BTnode(value, parent=parent)
+            new_node = self._new_node(value, parent=parent)
 
         # If the left node is defined push the old one down one level
         else:
@@ -293,11 +1227,13 @@ class BinaryTree:
 
             # Push it on the right side of the new node
             if (side == 'right'):
-                new_node = BTnode(value, right=old_node, parent=parent)
+                new_node = self._new_node(value, right=old_node,
+                                          parent=parent)
 
             # Push it on the left side of the new node (default)
             else:
-                new_node = BTnode(value, left=old_node, parent=parent)
+                new_node = self._new_node(value, left=old_node,
+                                          parent=parent)
 
             # Old node new parent
             old_node.set_parent(new_node)
@@ -305,6 +1241,10 @@ class BinaryTree:
         # Parent new left node
         parent.set_left(new_node)
 
+        # Record the operation
+        if (self.log is not None):
+            self.log.record('add_left', new_node, parent, side)
+
         return new_node
 
     def add_right(self, value, parent, side='right'):
@@ -315,25 +1255,34 @@ class BinaryTree:
         """
         # If no right node is defined
         if (parent.right is None):
-            new_node = BTnode(value, parent=parent)
+            new_node = self._new_node(value, parent=parent)
 
         # If the right node is defined push the old one down one level
         else:
 
-            # Old left node
+            # Old right node
             old_node = parent.right
 
             # Push it on the left side of the new node
             if (side == 'left'):
-                new_node = BTnode(value, left=old_node, parent=parent)
+                new_node = self._new_node(value, left=old_node,
+                                          parent=parent)
 
             # Push it on the right side of the new node (default)
             else:
-                new_node = BTnode(value, right=old_node, parent=parent)
+                new_node = self._new_node(value, right=old_node,
+                                          parent=parent)
+
+            # Old node new parent
+            old_node.set_parent(new_node)
 
         # Parent new right node
         parent.set_right(new_node)
 
+        # Record the operation
+        if (self.log is not None):
+            self.log.record('add_right', new_node, parent, side)
+
         return new_node
 
     def add_subtree(self, root, parent, side='left'):
@@ -352,14 +1301,36 @@ class BinaryTree:
         else:
             parent.set_left(root)
 
+        # Record the operation
+        if (self.log is not None):
+            self.log.record('add_subtree', root, parent, side)
+
         return
 
-    def clear(self):
+    def clear(self, release=False, unlink=False):
         """
-        Deletes all nodes but the root.
+        Deletes all nodes but the root. If <release> is <True> and the binary
+        tree has a node pool, the deleted nodes are recycled and must not be
+        used anymore (they will be reused for new nodes). If <unlink> is
+        <True> all links between the deleted nodes are cleared.
         """
-        self.root.set_left(None)
-        self.root.set_right(None)
+        with gc_paused(self.gc_mode == 'off'):
+
+            left_child = self.root.get_left()
+            right_child = self.root.get_right()
+
+            self.root.set_left(None)
+            self.root.set_right(None)
+
+            # Record the operation
+            if (self.log is not None):
+                self.log.record('clear')
+
+            # Recycle/unlink the deleted nodes
+            if (left_child is not None):
+                self._discard(left_child, release, unlink)
+            if (right_child is not None):
+                self._discard(right_child, release, unlink)
 
     def is_leaf(self, node):
         """
@@ -371,11 +1342,22 @@ class BinaryTree:
         else:
             return False
 
-    def search(self, value, order='queue'):
+    def search(self, value, order='queue', max_depth=None, max_nodes=None):
         """
         Searches the binary tree for a specified value and returns its node
         object. Returns <None> if the specified value is not in the binary tree.
+        If specified, only the first <max_nodes> nodes (in the search order)
+        down to depth <max_depth> are checked.
         """
+        # Limited search
+        if (max_depth is not None or max_nodes is not None):
+            for node in iter_nodes(self.root, order=order, max_depth=max_depth,
+                                   max_nodes=max_nodes):
+                if (node.get_value() == value):
+                    return node
+
+            return None
+
         # Search using pre-order
         if (order == 'pre'):
             node = self.search_pre(value, self.root)
@@ -451,19 +1433,10 @@ class BinaryTree:
         """
         if (node is not None):
 
-            # Check the left branch
-            left_branch = self.search_in(value, node.get_left())
-            if (left_branch is not None):
-                return left_branch
-
-            # Check the parent node
-            if (node.get_value() == value):
-                return node
-
-            # Check the right branch
-            right_branch = self.search_in(value, node.get_right())
-            if (right_branch is not None):
-                return right_branch
+            # Check the nodes following the parent links
+            for node in iter_in(node):
+                if (node.get_value() == value):
+                    return node
 
         return None
 
@@ -471,33 +1444,38 @@ class BinaryTree:
         """
         Searches the binary tree for the specified value using a stack (LIFO
         order) and returns the corresponding node object. Returns <None> if
-        not found.
+        not found. Each search uses its own stack, so concurrent searches
+        (for instance from different threads) do not interfere.
         """
-        # Initialize the stack
         stack = Stack()
 
+        # Use the list methods directly in the loop
+        items = stack.items
+        push = items.append
+        pop = items.pop
+
         # Add the root node
-        stack.push(node)
+        push(node)
 
         # Loop until the stack is empty
-        while (not stack.is_empty()):
+        while (items):
 
             # Get the last node from the stack
-            node = stack.pop()
+            node = pop()
 
             # Check the node
-            if (node.get_value() == value):
+            if (node.value == value):
                 return node
 
             # If it has a left child put it in the stack
-            left_child = node.get_left()
+            left_child = node.left
             if (left_child is not None):
-                stack.push(left_child)
+                push(left_child)
 
             # If it has a right child put it in the stack
-            right_child = node.get_right()
+            right_child = node.right
             if (right_child is not None):
-                stack.push(right_child)
+                push(right_child)
 
         return None
 
@@ -507,33 +1485,45 @@ class BinaryTree:
         order) and returns the corresponding node object. Returns <None> if
         not found.
         """
-        # Initialize the queue
-        queue = Queue()
+        # Check the nodes one level at a time
+        for level in iter_levels(node):
+            for node in level:
+                if (node.get_value() == value):
+                    return node
 
-        # Add the root node
-        queue.enqueue(node)
+        return None
 
-        # Loop until the queue is empty
-        while (not queue.is_empty()):
+    def search_batch(self, values, order='queue', max_depth=None,
+                     max_nodes=None):
+        """
+        Searches the binary tree for all the specified values with a single
+        traversal and returns a dictionary mapping each value to its node
+        object (the first one found using <order>). Values not in the binary
+        tree are mapped to <None>. If specified, only the first <max_nodes>
+        nodes down to depth <max_depth> are checked.
+        """
+        found = dict.fromkeys(values)
+        missing = set(found)
 
-            # Get the last node from the queue
-            node = queue.dequeue()
+        # Check each node against all the values still missing
+        if (missing):
+            for node in iter_nodes(self.root, order=order, max_depth=max_depth,
+                                   max_nodes=max_nodes):
 
-            # Check the node
-            if (node.get_value() == value):
-                return node
+                try:
+                    hit = (node.value in missing)
 
-            # If it has a left child put it in the queue
-            left_child = node.get_left()
-            if (left_child is not None):
-                queue.enqueue(left_child)
+                # Values that cannot be hashed cannot be in <values>
+                except TypeError:
+                    continue
 
-            # If it has a right child put it in the queue
-            right_child = node.get_right()
-            if (right_child is not None):
-                queue.enqueue(right_child)
+                if (hit):
+                    found[node.value] = node
+                    missing.discard(node.value)
+                    if (not missing):
+                        break
 
-        return None
+        return found
 
     def change(self, new_value, data, order='queue'):
         """
@@ -554,12 +1544,19 @@ class BinaryTree:
             # Change the node value
             node.set_value(new_value)
 
+            # Record the operation
+            if (self.log is not None):
+                self.log.record('change', node)
+
         return node
 
-    def remove(self, data, order='queue'):
+    def remove(self, data, order='queue', release=False, unlink=False):
         """
         Removes a value/node/sub-tree from the binary tree and returns the
-        node object. Returns <None> if not found.
+        node object. Returns <None> if not found. If <release> is <True> and
+        the binary tree has a node pool, the removed nodes are recycled and
+        the returned node must not be used anymore. If <unlink> is <True> all
+        links between the removed nodes are cleared.
         """
         # If <data> is the node
         if (isinstance(data, BTnode)):
@@ -572,17 +1569,351 @@ class BinaryTree:
         # If the value has been found
         if (node is not None):
 
-            # Get the parent node
-            parent = node.get_parent()
+            with gc_paused(self.gc_mode == 'off'):
+
+                # Get the parent node
+                parent = node.get_parent()
+
+                # If it is on the left branch
+                if (parent.get_left() is node):
+                    parent.set_left(None)
+
+                # If it is on the right branch
+                else:
+                    parent.set_right(None)
+
+                node.set_parent(None)
 
-            # If it is on the left branch
-            if (parent.get_left() == node):
-                parent.set_left(None)
+                # Record the operation
+                if (self.log is not None):
+                    self.log.record('remove', node)
 
-            # If it is on the right branch
+                # Recycle/unlink the removed nodes
+                self._discard(node, release, unlink)
+
+        return node
+
+    def iter_range(self, low, high, node=None):
+        """
+        Yields, using in-order, the nodes with values between <low> and <high>
+        (included) in the ordered tree/sub-tree starting at <node> (the root if
+        not specified).
+        """
+        root = self.root if (node is None) else node
+
+        # Find the first node with a value not lower than <low>
+        first = None
+        node = root
+        while (node is not None):
+            if (node.value < low):
+                node = node.right
             else:
-                parent.set_right(None)
+                first = node
+                node = node.left
+
+        # Follow the in-order until past <high>
+        node = first
+        while (node is not None and node.value <= high):
+            yield node
+            node = successor(node, root)
+
+    def path(self, value, node=None):
+        """
+        Returns the list of nodes from <node> (the root if not specified) to
+        the node with the specified value in an ordered tree/sub-tree. Returns
+        <None> if not found.
+        """
+        path = []
+        node = self.root if (node is None) else node
+        while (node is not None):
+
+            path.append(node)
+
+            # Value found
+            if (node.value == value):
+                return path
+
+            # Go down on the side that can contain the value
+            node = node.left if (value < node.value) else node.right
+
+        return None
+
+    def nearest(self, value, node=None):
+        """
+        Returns the node with the value nearest to the specified value in the
+        ordered tree/sub-tree starting at <node> (the root if not specified).
+        The nearest lower and higher values are found by comparison, and the
+        nearest one is chosen subtracting them from <value>. If two values are
+        equally near, or if they cannot be subtracted (like strings), the lower
+        one is returned.
+        """
+        lower = None
+        higher = None
+        node = self.root if (node is None) else node
+        while (node is not None):
+
+            # Value found
+            if (node.value == value):
+                return node
+
+            # Go down on the side that can contain the value
+            if (value < node.value):
+                higher = node
+                node = node.left
+            else:
+                lower = node
+                node = node.right
+
+        # Only one side (or none)
+        if (lower is None or higher is None):
+            return higher if (lower is None) else lower
+
+        # Choose the nearest one
+        try:
+            if (higher.value - value < value - lower.value):
+                return higher
+        except TypeError:
+            pass
+
+        return lower
+
+    def copy(self):
+        """
+        Returns a copy of the binary tree (the values are not copied). The copy
+        uses the same node pool and garbage collector mode.
+        """
+        return BinaryTree(self.copy_subtree(self.root), pool=self.pool,
+                          gc_mode=self.gc_mode)
+
+    def copy_subtree(self, node):
+        """
+        Returns the root node of a copy of the sub-tree starting at <node> (the
+        values are not copied).
+        """
+        return build_subtree(*flatten_subtree(node))
+
+    def node_at(self, path):
+        """
+        Returns the node at the specified path from the root. Returns <None> if
+        there is no node at that path.
+        """
+        return _descend(self.root, path)
+
+    def diff(self, other):
+        """
+        Returns the list of operations (edit script) changing the binary tree
+        into the binary tree <other>. Identical sub-trees are skipped (same
+        exact hash, or same hash confirmed node by node if the values are not
+        hashed exactly), so only the changed paths are visited. The operations
+        are:
+        ('change', path, value)             Changes the value of a node.
+        ('insert', path, values, shape)     Inserts a new sub-tree.
+        ('move', from_path, to_path)        Moves a sub-tree.
+        ('remove', path)                    Removes a sub-tree.
+        """
+        script = []
+        removed = {}
+        inserted = []
+
+        # Compare the nodes at the same path
+        pairs = [(self.root, other.root, '')]
+        while (pairs):
+
+            node_a, node_b, path = pairs.pop()
+
+            # Skip identical sub-trees (hashes can collide)
+            if (node_a.subtree_hash() == node_b.subtree_hash()
+                    and is_same_tree(node_a, node_b)):
+                continue
+
+            # Different values
+            if (node_a.value != node_b.value):
+                script.append(('change', path, node_b.value))
+
+            # Compare the children
+            for step, child_a, child_b in (('L', node_a.left, node_b.left),
+                                           ('R', node_a.right, node_b.right)):
+
+                # Only in this tree (save the sub-trees by hash)
+                if (child_b is None):
+                    if (child_a is not None):
+                        removed.setdefault(child_a.subtree_hash(), []) \
+                            .append((path + step, child_a))
 
-            node.set_parent(None)
+                # Only in the other tree
+                elif (child_a is None):
+                    inserted.append((path + step, child_b))
+
+                # In both trees
+                else:
+                    pairs.append((child_a, child_b, path + step))
+
+        # Sub-trees inserted and identical to a removed one are moved
+        for path, node in inserted:
+
+            bucket = removed.get(node.subtree_hash(), [])
+            for i, (from_path, old_node) in enumerate(bucket):
+                if (is_same_tree(old_node, node)):
+                    script.append(('move', from_path, path))
+                    del bucket[i]
+                    break
+
+            else:
+                values, shape = flatten_subtree(node)
+                script.append(('insert', path, values, shape))
+
+        # Sub-trees removed
+        for bucket in removed.values():
+            for path, old_node in bucket:
+                script.append(('remove', path))
+
+        return script
+
+    def apply_patch(self, script):
+        """
+        Applies the edit script returned by <diff> to the binary tree (which
+        must be identical to the one used to create the edit script). Raises
+        <ValueError> if a path in the edit script does not match the binary
+        tree.
+        """
+        for operation in script:
+
+            # Change the value of a node
+            if (operation[0] == 'change'):
+                self.change(operation[2], self._patch_node(operation[1]))
+
+            # Remove a sub-tree
+            elif (operation[0] == 'remove'):
+                self.remove(self._patch_node(operation[1]))
+
+            # Move a sub-tree
+            elif (operation[0] == 'move'):
+                root = self.remove(self._patch_node(operation[1]))
+                self._attach_at(root, operation[2])
+
+            # Insert a new sub-tree
+            else:
+                root = build_subtree(operation[2], operation[3])
+                self._attach_at(root, operation[1])
+
+    def _new_node(self, value, left=None, right=None, parent=None):
+        """
+        Returns a new node with the specified content and linked nodes, taken
+        from the node pool if the binary tree has one.
+        """
+        if (self.pool is None):
+            return BTnode(value, left=left, right=right, parent=parent)
+
+        return self.pool.acquire(value, left=left, right=right, parent=parent)
+
+    def _discard(self, node, release, unlink):
+        """
+        Recycles (if <release> is <True> and the binary tree has a node pool)
+        or unlinks (if <unlink> is <True>) the nodes of the detached sub-tree
+        starting at <node>.
+        """
+        if (release and self.pool is not None):
+            self.pool.release(node)
+
+        elif (unlink):
+            unlink_subtree(node)
+
+    def _attach_at(self, root, path):
+        """
+        Adds the sub-tree starting at <root> at the specified (empty) path.
+        """
+        parent = self._patch_node(path[:-1])
+        side = 'left' if (path[-1] == 'L') else 'right'
+
+        if (getattr(parent, side) is not None):
+            raise ValueError("path {!r} is not empty".format(path))
+
+        self.add_subtree(root, parent, side=side)
+
+    def _patch_node(self, path):
+        """
+        Returns the node at the specified path of an edit script. Raises
+        <ValueError> if there is no node at that path.
+        """
+        node = self.node_at(path)
+        if (node is None):
+            raise ValueError("no node at path {!r}".format(path))
 
         return node
+
+    def _indexed(self, target_hash):
+        """
+        Returns the nodes of the binary tree with the sub-tree hash
+        <target_hash>. The index of the sub-tree hashes is built the first
+        time, then only the paths hashed again (the changed paths) and the
+        new sub-trees are added. Nodes not in the binary tree anymore, or with
+        a different hash, are removed from the index when found.
+        """
+        root = self.root
+        root.subtree_hash()
+
+        # Build the index again if missing or with too many old nodes
+        if (self._index is None
+                or self._index_size > 2 * root.subtree_info()[0] + 64):
+            self._index = {}
+            self._index_nodes = {}
+            self._index_size = 0
+            self._index_stamp = -1
+
+        index = self._index
+        indexed = self._index_nodes
+        stamp = self._index_stamp
+
+        # Add the nodes not in the index with their current hash, visiting
+        # the sub-trees new or hashed again since the last update
+        stack = [root]
+        while (stack):
+
+            node = stack.pop()
+
+            if (indexed.get(node) != node._hash):
+                indexed[node] = node._hash
+                index.setdefault(node._hash, []).append(node)
+                self._index_size += 1
+
+            elif (node._stamp <= stamp):
+                continue
+
+            if (node.left is not None):
+                stack.append(node.left)
+            if (node.right is not None):
+                stack.append(node.right)
+
+        self._index_stamp = next(_stamps) - 1
+
+        bucket = index.get(target_hash)
+        if (bucket is None):
+            return []
+
+        # Keep the nodes still in the binary tree with the same hash (going up
+        # only while the parent links back, as overwritten sub-trees can keep
+        # their parent)
+        nodes = []
+        for node in bucket:
+
+            top = node
+            parent = top.parent
+            while (parent is not None
+                   and (parent.left is top or parent.right is top)):
+                top = parent
+                parent = top.parent
+
+            if (node._hash == target_hash and top is root):
+                nodes.append(node)
+
+            elif (indexed.get(node) == target_hash):
+                del indexed[node]
+
+        # Update the index
+        self._index_size -= len(bucket) - len(nodes)
+        if (nodes):
+            index[target_hash] = nodes
+        else:
+            del index[target_hash]
+
+        return nodes
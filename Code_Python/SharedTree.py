@@ -0,0 +1,469 @@
+"""
+Read-Only Binary Tree in Shared Memory
+
+Copyright (c) 2021 Gabriele Gilardi
+
+
+Notes
+-----
+- Written in Python 3.8.5, requires Python 3.9 or later (tested in 3.9 and
+  3.11). In Python 3.8 each value of a shareable list is found adding the
+  sizes of all values before it, so searches cost O(n^2).
+- Read-only copy of a binary tree stored in shared memory, so that many
+  processes can use the same tree without each one having its own copy.
+- The nodes are numbered level by level (the root is 0) and are identified by
+  their index. The links (left, right, and parent index, -1 if missing) are
+  stored in an array of integers, the values in a shareable list (values can
+  be int, float, bool, str, bytes, or None). Shareable lists drop the null
+  characters at the end of str/bytes values, so such values are rejected.
+- Other processes attach to the shared tree using its name (no copy).
+- Same search methods and helper functions of the binary tree class.
+- Every process must call <close()> when done (or use a <with> statement) and
+  the process that created the shared tree must also call <unlink()>.
+- Only the process that created the shared tree (and its child processes,
+  which share the same resource tracker) keeps it registered with the
+  resource tracker, which destroys it if the process ends without calling
+  <unlink()>. Other processes can attach and end at any time.
+- Examples of usage are at the end of the file.
+
+
+SharedTree Class
+----------------
+name            Name of the shared tree.
+size            Number of nodes.
+values          Shareable list with the node values.
+left            Array with the left child indexes.
+right           Array with the right child indexes.
+parent          Array with the parent indexes.
+__init__()      Attaches to an existing shared tree.
+__repr__()      Returns the string representation of the shared tree.
+__enter__()     Returns the shared tree (for <with> statements).
+__exit__()      Closes the shared tree (for <with> statements).
+from_tree()     Creates a shared tree from a binary tree/sub-tree.
+close()         Detaches from the shared tree.
+unlink()        Destroys the shared tree.
+get_value()     Returns the value of a node.
+node_info()     Returns the node information in a list.
+tree_info()     Returns the number of nodes and height of a tree/sub-tree.
+tree_nodes()    Returns all node information of a tree/sub-tree.
+iter_nodes()    Yields the nodes of a tree/sub-tree in the search order.
+search()        Searches the shared tree for a specific value.
+search_batch()  Searches the shared tree for many values at once.
+"""
+
+
+import os
+from array import array
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory, ShareableList
+
+# Relative imports when used as a package, plain imports when used from
+# inside the folder
+try:
+    from .BinaryTree import iter_levels
+except ImportError:
+    from BinaryTree import iter_levels
+
+
+# Types of values that can be stored in a shared tree
+_VALUE_TYPES = (int, float, bool, str, bytes, type(None))
+
+# Names of the shared trees created by this process (forked child processes
+# inherit them together with the resource tracker)
+_created = set()
+
+
+class SharedTree:
+    """
+    Read-only binary tree class using shared memory.
+    """
+    def __init__(self, name, track=None):
+        """
+        Attaches to the existing shared tree with the specified name. If
+        <track> is <True> the shared tree stays registered with the resource
+        tracker of the process. If not specified, it stays registered only if
+        created by this process (or by its parent, if forked). Child processes
+        started in other ways must use <track=True>.
+        """
+        self.name = name
+
+        # Shared memory blocks
+        self._links = SharedMemory(name=name)
+        self.values = ShareableList(name=name + '_values')
+        self.size = len(self.values)
+
+        # Attaching registers the blocks with the resource tracker, which
+        # would destroy them when this process ends
+        if (track is None):
+            track = (name in _created)
+        if (not track and os.name == 'posix'):
+            resource_tracker.unregister(self._links._name, 'shared_memory')
+            resource_tracker.unregister(self.values.shm._name,
+                                        'shared_memory')
+
+        # Arrays with the links
+        n = self.size
+        links = self._links.buf.cast('q')
+        self.left = links[0:n]
+        self.right = links[n:2*n]
+        self.parent = links[2*n:3*n]
+        links.release()
+
+    def __repr__(self):
+        """
+        Returns the string representation of the shared tree.
+        """
+        return ("\nSharedTree object \
+                 \n- name = {} \
+                 \n- root value = {} \
+                 \n- size = {}" \
+                .format(self.name, self.values[0], self.size))
+
+    def __enter__(self):
+        """
+        Returns the shared tree.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Detaches from the shared tree.
+        """
+        self.close()
+
+    @classmethod
+    def from_tree(cls, node, name=None):
+        """
+        Creates a shared tree with a copy of the tree/sub-tree starting at
+        <node> and returns it. If <name> is not specified a unique name is
+        generated. Raises <TypeError> if the type of a value cannot be stored
+        in shared memory, and <ValueError> if a str/bytes value ends with a
+        null character (it would be dropped).
+        """
+        # Number the nodes level by level
+        nodes = [node for level in iter_levels(node) for node in level]
+        index = {id(node): i for i, node in enumerate(nodes)}
+        n = len(nodes)
+
+        # Check the values before creating anything
+        for node in nodes:
+
+            value = node.value
+            if (type(value) not in _VALUE_TYPES):
+                raise TypeError("values of type {!r} cannot be stored in a "
+                                "shared tree".format(type(value).__name__))
+
+            if (isinstance(value, (str, bytes))
+                    and value[-1:] in ('\x00', b'\x00')):
+                raise ValueError("value {!r} ends with a null character and "
+                                 "cannot be stored in a shared tree"
+                                 .format(value))
+
+        # Links (-1 if missing), the root has no parent
+        links = [-1] * (3 * n)
+        for i, node in enumerate(nodes):
+            if (node.left is not None):
+                links[i] = index[id(node.left)]
+                links[2*n + index[id(node.left)]] = i
+            if (node.right is not None):
+                links[n + i] = index[id(node.right)]
+                links[2*n + index[id(node.right)]] = i
+
+        # Copy the links in shared memory
+        shm = SharedMemory(name=name, create=True, size=8 * len(links))
+        buffer = shm.buf.cast('q')
+        buffer[:len(links)] = array('q', links)
+        buffer.release()
+
+        # Copy the values in shared memory (if it fails, for instance with
+        # integers too large, destroy the blocks already created)
+        try:
+            values = ShareableList([node.value for node in nodes],
+                                   name=shm.name + '_values')
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            try:
+                block = SharedMemory(name=shm.name + '_values')
+            except FileNotFoundError:
+                pass
+            else:
+                block.close()
+                block.unlink()
+            raise
+
+        values.shm.close()
+        shm.close()
+
+        _created.add(shm.name)
+
+        return cls(shm.name)
+
+    def close(self):
+        """
+        Detaches from the shared tree (the shared tree is not destroyed).
+        """
+        self.left.release()
+        self.right.release()
+        self.parent.release()
+        self._links.close()
+        self.values.shm.close()
+
+    def unlink(self):
+        """
+        Destroys the shared tree (should be called only once, by the process
+        that created it).
+        """
+        self._links.unlink()
+        self.values.shm.unlink()
+        _created.discard(self.name)
+
+    def get_value(self, index):
+        """
+        Returns the value of the node with the specified index.
+        """
+        return self.values[index]
+
+    def node_info(self, index):
+        """
+        Returns in a list the information (value, left child value, right child
+        value, parent value) for the node with the specified index.
+        """
+        info = [self.values[index]]
+        for links in (self.left, self.right, self.parent):
+            link = links[index]
+            info.append(None if (link < 0) else self.values[link])
+
+        return info
+
+    def tree_info(self, index=0):
+        """
+        Returns the number of nodes and the height of the sub-tree starting at
+        the node with the specified index.
+        """
+        left = self.left
+        right = self.right
+        size = 0
+        height = -1
+
+        # Process the sub-tree one level at a time
+        level = [index]
+        while (level):
+
+            size += len(level)
+            height += 1
+
+            # Build the next level
+            next_level = []
+            for i in level:
+                if (left[i] >= 0):
+                    next_level.append(left[i])
+                if (right[i] >= 0):
+                    next_level.append(right[i])
+            level = next_level
+
+        return size, height
+
+    def tree_nodes(self, index=0):
+        """
+        Returns in a list of lists the node information in the tree/sub-tree
+        starting at the node with the specified index.
+        """
+        return [self.node_info(i) for i in self.iter_nodes(index=index)]
+
+    def iter_nodes(self, order='queue', index=0):
+        """
+        Yields the node indexes of the tree/sub-tree starting at the node with
+        the specified index, in the same order they are checked by the search
+        method of the binary tree class.
+        """
+        left = self.left
+        right = self.right
+        parent = self.parent
+
+        # Pre-order
+        if (order == 'pre'):
+            stack = [index]
+            while (stack):
+                i = stack.pop()
+                yield i
+                if (right[i] >= 0):
+                    stack.append(right[i])
+                if (left[i] >= 0):
+                    stack.append(left[i])
+
+        # Post-order (following the parent links)
+        elif (order == 'post'):
+            i = index
+            while (True):
+
+                # Go down to the first node without children
+                while (left[i] >= 0 or right[i] >= 0):
+                    i = left[i] if (left[i] >= 0) else right[i]
+
+                yield i
+
+                # Go up yielding the parents until there is a right sub-tree
+                while (i != index):
+                    p = parent[i]
+                    if (left[p] == i and right[p] >= 0):
+                        i = right[p]
+                        break
+                    i = p
+                    yield i
+
+                # All nodes have been visited
+                else:
+                    return
+
+        # In-order (following the parent links)
+        elif (order == 'in'):
+            i = index
+            while (left[i] >= 0):
+                i = left[i]
+
+            while (True):
+
+                yield i
+
+                # Next node is the leftmost node of the right sub-tree
+                if (right[i] >= 0):
+                    i = right[i]
+                    while (left[i] >= 0):
+                        i = left[i]
+
+                # Otherwise go up until coming from a left sub-tree
+                else:
+                    while (i != index and right[parent[i]] == i):
+                        i = parent[i]
+                    if (i == index):
+                        return
+                    i = parent[i]
+
+        # Using a stack (LIFO order)
+        elif (order == 'stack'):
+            stack = [index]
+            while (stack):
+                i = stack.pop()
+                yield i
+                if (left[i] >= 0):
+                    stack.append(left[i])
+                if (right[i] >= 0):
+                    stack.append(right[i])
+
+        # Level by level (FIFO order) - default
+        else:
+
+            # The entire tree is already numbered level by level
+            if (index == 0):
+                yield from range(self.size)
+                return
+
+            level = [index]
+            while (level):
+                yield from level
+                next_level = []
+                for i in level:
+                    if (left[i] >= 0):
+                        next_level.append(left[i])
+                    if (right[i] >= 0):
+                        next_level.append(right[i])
+                level = next_level
+
+    def search(self, value, order='queue', index=0):
+        """
+        Searches the tree/sub-tree starting at the node with the specified
+        index for a value and returns the index of its node. Returns <None> if
+        the value is not in the tree/sub-tree.
+        """
+        values = self.values
+        for i in self.iter_nodes(order=order, index=index):
+            if (values[i] == value):
+                return i
+
+        return None
+
+    def search_batch(self, values, order='queue', index=0):
+        """
+        Searches the tree/sub-tree starting at the node with the specified
+        index for all the specified values with a single traversal and returns
+        a dictionary mapping each value to the index of its node (the first
+        one found using <order>). Values not in the tree are mapped to <None>.
+        """
+        found = dict.fromkeys(values)
+        missing = set(found)
+
+        # Check each node against all the values still missing
+        if (missing):
+            for i in self.iter_nodes(order=order, index=index):
+                value = self.values[i]
+                if (value in missing):
+                    found[value] = i
+                    missing.discard(value)
+                    if (not missing):
+                        break
+
+        return found
+
+
+def _search_worker(args):
+    """
+    Attaches to a shared tree and searches a value (used in the examples).
+    """
+    name, value = args
+    with SharedTree(name) as tree:
+        return tree.search(value)
+
+
+if __name__ == '__main__':
+    """
+    Tests the SharedTree class
+    """
+    import subprocess
+    import sys
+    from multiprocessing import Pool
+    from BinaryTree import BinaryTree
+
+    # Build the tree
+    #
+    #                   0
+    #         1                   2
+    #    3         4         5         6
+    #
+    tree = BinaryTree(0)
+    n1 = tree.add_left(1, tree.root)
+    n2 = tree.add_right(2, tree.root)
+    tree.add_left(3, n1)
+    tree.add_right(4, n1)
+    tree.add_left(5, n2)
+    tree.add_right(6, n2)
+
+    print('\nCreate the shared tree')
+    shared = SharedTree.from_tree(tree.root)
+    print('- size and height:', shared.tree_info())         # (7, 2)
+    print('- sub-tree at node 2:', shared.tree_nodes(2))
+    # [[2, 5, 6, 0], [5, None, None, 2], [6, None, None, 2]]
+
+    print('\nSearch values')
+    print('- index of 4 (in-order):', shared.search(4, order='in'))     # 4
+    print('- index of 9:', shared.search(9))                            # None
+    print('- batch:', shared.search_batch([6, 1]))      # {6: 6, 1: 1}
+
+    print('\nSearch values from other processes')
+    with Pool(2) as pool:
+        jobs = [(shared.name, value) for value in (3, 5, 9)]
+        print('- indexes:', pool.map(_search_worker, jobs))   # [3, 5, None]
+
+    print('\nSearch a value from an independent process')
+    code = ("from SharedTree import SharedTree\n"
+            "with SharedTree({!r}) as tree:\n"
+            "    print(tree.search(6))".format(shared.name))
+    result = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    print('- index of 6:', result.stdout.strip())             # 6
+    with SharedTree(shared.name) as tree:
+        print('- index of 6 after it ended:', tree.search(6))    # 6
+
+    shared.close()
+    shared.unlink()
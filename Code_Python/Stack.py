@@ -11,6 +11,9 @@ Notes
 - The stack top is at the back of the list.
 - Duplicate items are allowed and removed in LIFO order.
 - The stack can be reversed in place.
+- The size is the length of the list (no separate counter to update) and
+  several items can be pushed at once. Hot loops can use <items.append> and
+  <items.pop> directly.
 - Examples of usage are at the end of the file.
 - Reference: "Problem Solving with Algorithms and Data Structures", by Miller
   and Ranum.
@@ -24,6 +27,7 @@ __init__()      Initializes the stack.
 __repr_()       Returns the string representation of the stack.
 is_empty()      Checks if the stack is empty or not.
 push()          Adds one item to the top of the stack.
+push_many()     Adds several items to the top of the stack.
 pop()           Returns and removes the item at the top of the stack.
 peek()          Returns the item at the top of the stack.
 reverse()       Reverses the stack.
@@ -42,12 +46,10 @@ class Stack:
         # Initialize to an empty list
         if (init_list is None):
             self.items = []
-            self.size = 0
 
         # Initialize to the initial list
         else:
             self.items = init_list
-            self.size = len(init_list)
 
     def __repr__(self):
         """
@@ -55,31 +57,42 @@ class Stack:
         """
         return ("{}".format(self.items))
 
+    @property
+    def size(self):
+        """
+        Returns the length of the stack.
+        """
+        return len(self.items)
+
     def is_empty(self):
         """
         Returns <True> if the stack is empty and <False> if it is not.
         """
-        return not self.size
+        return not self.items
 
     def push(self, item):
         """
         Adds one item to the top of the stack.
         """
-        self.size += 1
         self.items.append(item)
 
+    def push_many(self, items):
+        """
+        Adds the items (in order) to the top of the stack.
+        """
+        self.items.extend(items)
+
     def pop(self):
         """
         Returns and removes the item at the top of the stack. Returns <None>
         if the list is empty.
         """
         # If the list is empty
-        if (self.size == 0):
+        if (not self.items):
             return None
 
         # If the list is not empty
         else:
-            self.size -= 1
             return self.items.pop()
 
     def peek(self):
@@ -88,7 +101,7 @@ class Stack:
         <None> if the list is empty.
         """
         # If the list is empty
-        if (self.size == 0):
+        if (not self.items):
             return None
 
         # If the list is not empty
@@ -106,7 +119,6 @@ class Stack:
         Removes all items from the stack.
         """
         self.items.clear()
-        self.size = 0
 
 
 if __name__ == '__main__':
@@ -130,6 +142,12 @@ if __name__ == '__main__':
     stack.push('hello')
     print('- stack:', stack)            # [3, (6.4, 3.3), True, 'hello']
 
+    print('\nAdd several items')
+    stack.push_many([1, 2])
+    print('- stack:', stack)    # [3, (6.4, 3.3), True, 'hello', 1, 2]
+    print('- item returned:', stack.pop())          # 2
+    print('- item returned:', stack.pop())          # 1
+
     print('\nPeek and pop the item')
     print('- item at the top:', stack.peek())       # hello
     print('- item returned:', stack.pop())          # hello
@@ -0,0 +1,433 @@
+"""
+Operation Log and Crash-Safe Persistence for Binary Trees
+
+Copyright (c) 2021 Gabriele Gilardi
+
+
+Notes
+-----
+- Written and tested in Python 3.8.5.
+- Append-only log (write-ahead log) of the changes made to a binary tree
+  using its methods (add_left, add_right, add_subtree, change, remove, and
+  clear), so that saving the tree costs proportionally to the changes and
+  not to the number of nodes.
+- Each node has a stable id (attribute <_id>, the root is 0) used by the
+  records to refer to it. New nodes get new ids, removed ids are not reused.
+- The log is periodically compacted into a snapshot file (the tree values,
+  shape, and ids), then emptied. The snapshot is written to a temporary file
+  and then renamed, and the folder is written to disk before the log is
+  emptied, so there is always a complete snapshot on disk.
+- On start-up the tree is rebuilt from the snapshot and the log records are
+  replayed. Records already in the snapshot (crash after the snapshot was
+  written but before the log was emptied) are skipped using their sequence
+  number. A truncated/corrupted record (crash while writing it) ends the
+  replay and is removed from the log.
+- Each record is a frame with length and CRC-32 of the data, followed by the
+  pickled data. With <sync=False> the records are flushed to the operating
+  system (safe if the process crashes), with <sync=True> they are also
+  written to disk (safe if the system crashes, but much slower).
+- Values must be picklable. Changes made directly using the node set methods
+  are not recorded.
+- Examples of usage are at the end of the file.
+
+
+TreeLog Class
+-------------
+path            Path of the log file (the snapshot is <path>.snapshot).
+compact_every   Number of records between compactions (None for manual).
+sync            Writes each record to disk if <True>.
+tree            Binary tree recorded by the log.
+seq             Sequence number of the last record.
+count           Number of records in the log file.
+next_id         Id of the next new node.
+__init__()      Initializes the log.
+__repr__()      Returns the string representation of the log.
+__enter__()     Returns the log (for <with> statements).
+__exit__()      Closes the log (for <with> statements).
+open()          Recovers/creates the binary tree and starts recording.
+record()        Appends a change to the log.
+compact()       Writes a snapshot and empties the log.
+close()         Stops recording and closes the log file.
+_assign_ids()   Assigns new ids to the nodes of a sub-tree.
+_load()         Rebuilds the binary tree from the snapshot.
+_replay()       Applies the log records to the binary tree.
+_save()         Writes the snapshot of the binary tree.
+"""
+
+
+import os
+import pickle
+from struct import Struct
+from zlib import crc32
+
+# Relative imports when used as a package, plain imports when used from
+# inside the folder
+try:
+    from .BinaryTree import BinaryTree, iter_nodes, flatten_subtree, \
+                            build_subtree
+except ImportError:
+    from BinaryTree import BinaryTree, iter_nodes, flatten_subtree, \
+                           build_subtree
+
+
+# Frame header (data length and CRC-32)
+_HEADER = Struct('<II')
+
+
+class TreeLog:
+    """
+    Operation log class.
+    """
+    def __init__(self, path, compact_every=None, sync=False):
+        """
+        Initializes the log using the file <path> (and <path>.snapshot for the
+        snapshot). If specified, the log is compacted every <compact_every>
+        records. If <sync> is <True> each record is also written to disk.
+        """
+        self.path = path
+        self.compact_every = compact_every
+        self.sync = sync
+        self.tree = None
+        self.seq = 0
+        self.count = 0
+        self.next_id = 0
+        self._file = None
+
+    def __repr__(self):
+        """
+        Returns the string representation of the log.
+        """
+        return ("\nTreeLog object \
+                 \n- path = {} \
+                 \n- records = {} \
+                 \n- sequence number = {}" \
+                .format(self.path, self.count, self.seq))
+
+    def __enter__(self):
+        """
+        Returns the log.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Closes the log.
+        """
+        self.close()
+
+    def open(self, data=None, pool=None, gc_mode='auto'):
+        """
+        Returns the binary tree saved in the snapshot and log files and starts
+        recording its changes. If there is no snapshot, a new binary tree is
+        created using <data> (a node object or the root value), <pool>, and
+        <gc_mode>, and its first snapshot is written. A recovered log longer
+        than <compact_every> records is compacted.
+        """
+        # Recover the binary tree
+        if (os.path.exists(self.path + '.snapshot')):
+            tree, nodes = self._load(pool, gc_mode)
+            self._replay(tree, nodes)
+
+        # Create a new binary tree
+        else:
+            tree = BinaryTree(data, pool=pool, gc_mode=gc_mode)
+            self.next_id = 0
+            self._assign_ids(tree.root)
+            self.tree = tree
+            self._save()
+            open(self.path, 'wb').close()
+
+        # Start recording
+        self.tree = tree
+        self._file = open(self.path, 'ab')
+        tree.log = self
+
+        # Compact the recovered log
+        if (self.compact_every is not None
+                and self.count >= self.compact_every):
+            self.compact()
+
+        return tree
+
+    def record(self, op, node=None, parent=None, side=None):
+        """
+        Appends to the log the operation <op> done on <node> (with <parent>
+        and <side> if it has been added). Called by the binary tree methods.
+        """
+        self.seq += 1
+
+        # Single node added (new id)
+        if (op == 'add_left' or op == 'add_right'):
+            node._id = self.next_id
+            self.next_id += 1
+            data = (self.seq, op, node._id, parent._id, side, node.value)
+
+        # Sub-tree added (new ids in pre-order)
+        elif (op == 'add_subtree'):
+            first = self._assign_ids(node)
+            values, shape = flatten_subtree(node)
+            data = (self.seq, op, first, parent._id, side, values, shape)
+
+        # Value changed
+        elif (op == 'change'):
+            data = (self.seq, op, node._id, node.value)
+
+        # Sub-tree removed
+        elif (op == 'remove'):
+            data = (self.seq, op, node._id)
+
+        # All nodes but the root removed
+        else:
+            data = (self.seq, op)
+
+        # Write the frame
+        payload = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+        self._file.write(_HEADER.pack(len(payload), crc32(payload)) + payload)
+        self._file.flush()
+        if (self.sync):
+            os.fsync(self._file.fileno())
+        self.count += 1
+
+        # Compact the log
+        if (self.compact_every is not None
+                and self.count >= self.compact_every):
+            self.compact()
+
+    def compact(self):
+        """
+        Writes the snapshot of the binary tree and empties the log. The cost
+        is proportional to the number of nodes.
+        """
+        self._save()
+        self._file.truncate(0)
+        self._file.flush()
+        if (self.sync):
+            os.fsync(self._file.fileno())
+        self.count = 0
+
+    def close(self):
+        """
+        Stops recording the binary tree changes and closes the log file.
+        """
+        if (self._file is not None):
+            self._file.close()
+            self._file = None
+
+        if (self.tree is not None):
+            self.tree.log = None
+            self.tree = None
+
+    def _assign_ids(self, node):
+        """
+        Assigns new ids (in pre-order) to the nodes of the sub-tree starting
+        at <node> and returns the first one.
+        """
+        first = self.next_id
+        for node in iter_nodes(node, order='pre'):
+            node._id = self.next_id
+            self.next_id += 1
+
+        return first
+
+    def _load(self, pool, gc_mode):
+        """
+        Returns the binary tree rebuilt from the snapshot and a dictionary
+        with its nodes by id.
+        """
+        with open(self.path + '.snapshot', 'rb') as f:
+            state = pickle.load(f)
+
+        self.seq = state['seq']
+        self.next_id = state['next_id']
+
+        # Rebuild the nodes and restore their ids
+        root = build_subtree(state['values'], state['shape'])
+        nodes = {}
+        for node, node_id in zip(iter_nodes(root, order='pre'), state['ids']):
+            node._id = node_id
+            nodes[node_id] = node
+
+        return BinaryTree(root, pool=pool, gc_mode=gc_mode), nodes
+
+    def _replay(self, tree, nodes):
+        """
+        Applies to <tree> (with nodes by id <nodes>) the log records newer than
+        the snapshot. The log is truncated at the first incomplete/corrupted
+        record.
+        """
+        # Crash before the (empty) log was created
+        if (not os.path.exists(self.path)):
+            open(self.path, 'wb').close()
+
+        with open(self.path, 'rb') as f:
+            buffer = f.read()
+
+        end = len(buffer)
+        offset = 0
+        count = 0
+        while (offset + _HEADER.size <= end):
+
+            # Check the frame
+            size, checksum = _HEADER.unpack_from(buffer, offset)
+            start = offset + _HEADER.size
+            payload = buffer[start:start + size]
+            if (len(payload) < size or crc32(payload) != checksum):
+                break
+
+            offset = start + size
+            count += 1
+            data = pickle.loads(payload)
+            seq, op = data[0], data[1]
+
+            # Already in the snapshot
+            if (seq <= self.seq):
+                continue
+
+            # Single node added
+            if (op == 'add_left' or op == 'add_right'):
+                node_id, parent_id, side, value = data[2:]
+                add = tree.add_left if (op == 'add_left') else tree.add_right
+                node = add(value, nodes[parent_id], side=side)
+                node._id = node_id
+                nodes[node_id] = node
+                self.next_id = max(self.next_id, node_id + 1)
+
+            # Sub-tree added (forget the nodes of the sub-tree it overwrites)
+            elif (op == 'add_subtree'):
+                first, parent_id, side, values, shape = data[2:]
+                parent = nodes[parent_id]
+                old_root = parent.right if (side == 'right') else parent.left
+                if (old_root is not None):
+                    for node in iter_nodes(old_root):
+                        del nodes[node._id]
+                root = build_subtree(values, shape)
+                for node_id, node in enumerate(iter_nodes(root, order='pre'),
+                                               first):
+                    node._id = node_id
+                    nodes[node_id] = node
+                tree.add_subtree(root, parent, side=side)
+                self.next_id = max(self.next_id, first + len(values))
+
+            # Value changed
+            elif (op == 'change'):
+                nodes[data[2]].set_value(data[3])
+
+            # Sub-tree removed (forget all its nodes)
+            elif (op == 'remove'):
+                root = nodes[data[2]]
+                for node in iter_nodes(root):
+                    del nodes[node._id]
+                tree.remove(root)
+
+            # All nodes but the root removed
+            else:
+                tree.clear()
+                nodes.clear()
+                nodes[tree.root._id] = tree.root
+
+            self.seq = seq
+
+        # Remove the incomplete/corrupted records
+        if (offset < end):
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+
+        self.count = count
+
+    def _save(self):
+        """
+        Writes the snapshot of the binary tree to a temporary file and then
+        replaces the old snapshot with it. Returns once the new snapshot (and
+        its name) is on disk, so the log can be emptied.
+        """
+        root = self.tree.root
+        values, shape = flatten_subtree(root)
+        state = {
+            'seq': self.seq,
+            'next_id': self.next_id,
+            'values': values,
+            'shape': shape,
+            'ids': [node._id for node in iter_nodes(root, order='pre')],
+        }
+
+        # Write the temporary file to disk
+        path = self.path + '.snapshot'
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Replace the old snapshot
+        os.replace(path + '.tmp', path)
+
+        # Write the renaming to disk (not possible on Windows)
+        if (os.name == 'posix'):
+            folder = os.open(os.path.dirname(os.path.abspath(path)),
+                             os.O_RDONLY)
+            try:
+                os.fsync(folder)
+            finally:
+                os.close(folder)
+
+
+if __name__ == '__main__':
+    """
+    Tests the TreeLog class
+    """
+    import tempfile
+    from BinaryTree import tree_nodes
+
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'tree.log')
+
+    print('\nCreate a new tree and record its changes')
+    #
+    #                   0
+    #         1                   2
+    #    -         4         -         -
+    #
+    log = TreeLog(path)
+    tree = log.open(0)
+    n1 = tree.add_left(1, tree.root)
+    n2 = tree.add_right(2, tree.root)
+    n3 = tree.add_left(3, n1)
+    tree.add_right(4, n1)
+    tree.change(-2, 2)
+    tree.remove(n3)
+    print(log)
+    # TreeLog object
+    # - records = 6
+    # - sequence number = 6
+    log.close()
+
+    print('\nRecover the tree and compact the log (more than 4 records)')
+    log = TreeLog(path, compact_every=4)
+    tree = log.open()
+    # [[0, 1, -2, None], [1, None, 4, 0], [-2, None, None, 0],
+    #  [4, None, None, 1]]
+    print(tree_nodes(tree.root))
+    print('- records:', log.count)                          # 0
+
+    print('\nAdd a node')
+    #
+    #                   0
+    #         1                  -2
+    #    -         4         5         -
+    #
+    tree.add_left(5, tree.search(-2))
+    print('- records:', log.count)                          # 1
+    log.close()
+
+    print('\nRecover the tree with a truncated last record')
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 1)
+    with TreeLog(path) as log:
+        tree = log.open()
+        # [[0, 1, -2, None], [1, None, 4, 0], [-2, None, None, 0],
+        #  [4, None, None, 1]]
+        print(tree_nodes(tree.root))
+        print('- records:', log.count)                      # 0
+
+    for name in os.listdir(folder):
+        os.remove(os.path.join(folder, name))
+    os.rmdir(folder)
@@ -0,0 +1,81 @@
+"""
+Binary Tree and Binary Node Data Structures (package)
+
+Copyright (c) 2021 Gabriele Gilardi
+
+
+Notes
+-----
+- Makes the folder importable as a package (the modules can still be used
+  directly from inside the folder).
+- The modules are imported only when one of their names is used for the first
+  time, so importing the package costs (almost) nothing.
+- Names equal to a module name (<BinaryTree>, <SharedTree>, <TreeLog>,
+  <Stack>, and <Queue>) are always the modules, so the classes with the same
+  name are used as <Code_Python.BinaryTree.BinaryTree> (or imported with
+  <from Code_Python.BinaryTree import BinaryTree>). All other names are the
+  functions/classes themselves (for instance <Code_Python.BTnode>).
+"""
+
+
+from importlib import import_module
+
+
+# Public names and the module defining them
+_modules = {
+    'BTnode': 'BinaryTree',
+    'BinaryTree': 'BinaryTree',
+    'NodePool': 'BinaryTree',
+    'node_info': 'BinaryTree',
+    'node_info_batch': 'BinaryTree',
+    'tree_info': 'BinaryTree',
+    'iter_levels': 'BinaryTree',
+    'tree_nodes': 'BinaryTree',
+    'iter_in': 'BinaryTree',
+    'iter_nodes': 'BinaryTree',
+    'sample_nodes': 'BinaryTree',
+    'tree_estimate': 'BinaryTree',
+    'successor': 'BinaryTree',
+    'predecessor': 'BinaryTree',
+    'is_same_tree': 'BinaryTree',
+    'intern_subtree': 'BinaryTree',
+    'flatten_subtree': 'BinaryTree',
+    'build_subtree': 'BinaryTree',
+    'unlink_subtree': 'BinaryTree',
+    'gc_paused': 'BinaryTree',
+    'SharedTree': 'SharedTree',
+    'TreeLog': 'TreeLog',
+    'Stack': 'Stack',
+    'Queue': 'Queue',
+}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name):
+    """
+    Imports the module defining <name> the first time <name> is used.
+    """
+    if (name not in _modules):
+        raise AttributeError("module {!r} has no attribute {!r}"
+                             .format(__name__, name))
+
+    # The import also sets the package attribute with the module name
+    module = import_module('.' + _modules[name], __name__)
+
+    # Names equal to the module name are the module
+    if (name == _modules[name]):
+        return module
+
+    # Bind the name so it is looked up only once
+    value = getattr(module, name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    """
+    Returns the names defined in the package.
+    """
+    return sorted(list(globals()) + __all__)
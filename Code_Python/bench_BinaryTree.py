@@ -0,0 +1,267 @@
+"""
+Benchmarks for the binary tree data structure in file <BinaryTree.py>
+
+Copyright (c) 2021 Gabriele Gilardi
+"""
+
+import gc
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+from BinaryTree import *
+from Stack import Stack
+from TreeLog import TreeLog
+
+
+class GCTimer:
+    """
+    Measures number and duration of the garbage collector passes.
+    """
+    def __init__(self):
+        """
+        Initializes the counters and registers the timer with the collector.
+        """
+        self.count = 0
+        self.total = 0.0
+        self.longest = 0.0
+        self.start = None
+        gc.callbacks.append(self)
+
+    def __call__(self, phase, info):
+        """
+        Called by the garbage collector at the start and stop of each pass.
+        """
+        if (phase == 'start'):
+            self.start = perf_counter()
+
+        elif (self.start is not None):
+            pause = perf_counter() - self.start
+            self.count += 1
+            self.total += pause
+            self.longest = max(self.longest, pause)
+            self.start = None
+
+    def stop(self):
+        """
+        Unregisters the timer and returns count, total and longest pause (ms).
+        """
+        gc.callbacks.remove(self)
+        return self.count, 1000.0 * self.total, 1000.0 * self.longest
+
+
+def build_tree(tree, size):
+    """
+    Adds <size> nodes (plus the root) to <tree> building a balanced tree.
+    """
+    level = [tree.root]
+    count = 0
+    while (count < size):
+        next_level = []
+        for node in level:
+            next_level.append(tree.add_left(count, node))
+            next_level.append(tree.add_right(count + 1, node))
+            count += 2
+            if (count >= size):
+                break
+        level = next_level
+
+    return tree
+
+
+def churn(tree, size, loops, release):
+    """
+    Repeatedly fills and clears <tree>, returning the node allocation rate
+    (nodes/s) and the garbage collector statistics.
+    """
+    timer = GCTimer()
+    start = perf_counter()
+    for _ in range(loops):
+        build_tree(tree, size)
+        tree.clear(release=release)
+    elapsed = perf_counter() - start
+
+    return size * loops / elapsed, timer.stop()
+
+
+print('\n==== Node churn (add/clear loop):')
+size = 20000
+loops = 20
+for label, pool in (('no pool', None), ('pool', NodePool())):
+    rate, (count, total, longest) = churn(BinaryTree(0, pool=pool), size,
+                                          loops, release=True)
+    print('- {:8s} {:10.0f} nodes/s, {:4d} gc passes, {:8.2f} ms total, '
+          '{:6.2f} ms longest'.format(label, rate, count, total, longest))
+
+print('\n==== Remove a large sub-tree and collect the garbage:')
+size = 200000
+for label, unlink in (('drop', False), ('unlink', True)):
+    tree = build_tree(BinaryTree(0, gc_mode='off'), size)
+    gc.collect()
+    start = perf_counter()
+    tree.clear(unlink=unlink)
+    elapsed = 1000.0 * (perf_counter() - start)
+    timer = GCTimer()
+    gc.collect()
+    count, total, longest = timer.stop()
+    print('- {:8s} clear {:8.2f} ms, next gc pause {:8.2f} ms'
+          .format(label, elapsed, total))
+
+print('\n==== Import time (best of 10 fresh interpreters):')
+folder = os.path.dirname(os.path.abspath(__file__))
+codes = (('python only', 'pass'),
+         ('package', 'import Code_Python'),
+         ('package + tree', 'import Code_Python; Code_Python.BinaryTree'),
+         ('module', 'import sys; sys.path.insert(0, "Code_Python"); '
+                    'import BinaryTree'))
+for label, code in codes:
+    best = None
+    for _ in range(10):
+        start = perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True,
+                       cwd=os.path.dirname(folder))
+        elapsed = 1000.0 * (perf_counter() - start)
+        best = elapsed if (best is None) else min(best, elapsed)
+    print('- {:15s} {:8.2f} ms'.format(label, best))
+
+print('\n==== Search 1000 values in a tree with 20000 nodes:')
+tree = build_tree(BinaryTree(0), 20000)
+values = list(range(0, 40000, 40))
+start = perf_counter()
+nodes = [tree.search(value) for value in values]
+loop = 1000.0 * (perf_counter() - start)
+start = perf_counter()
+batch = tree.search_batch(values)
+single = 1000.0 * (perf_counter() - start)
+print('- one search per value {:10.2f} ms'.format(loop))
+print('- single traversal     {:10.2f} ms'.format(single))
+
+print('\n==== Stack push/pop of 200000 items (best of 5):')
+
+
+def stack_methods(items):
+    """
+    Pushes and pops all items calling the stack methods.
+    """
+    stack = Stack()
+    for item in items:
+        stack.push(item)
+    while (not stack.is_empty()):
+        stack.pop()
+
+
+def stack_fast(items):
+    """
+    Pushes all items at once and pops them using the list method directly.
+    """
+    stack = Stack()
+    stack.push_many(items)
+    pop = stack.items.pop
+    while (stack.items):
+        pop()
+
+
+def search_methods(tree, value):
+    """
+    Searches <value> using a new stack and its methods for each node.
+    """
+    stack = Stack()
+    stack.push(tree.root)
+    while (not stack.is_empty()):
+        node = stack.pop()
+        if (node.get_value() == value):
+            return node
+        if (node.get_left() is not None):
+            stack.push(node.get_left())
+        if (node.get_right() is not None):
+            stack.push(node.get_right())
+    return None
+
+
+def best_of(func, *args):
+    """
+    Returns the best time (ms) of five calls.
+    """
+    best = None
+    for _ in range(5):
+        start = perf_counter()
+        func(*args)
+        elapsed = 1000.0 * (perf_counter() - start)
+        best = elapsed if (best is None) else min(best, elapsed)
+    return best
+
+
+items = list(range(200000))
+print('- methods        {:8.2f} ms'.format(best_of(stack_methods, items)))
+print('- push_many/pop  {:8.2f} ms'.format(best_of(stack_fast, items)))
+
+print('\n==== Stack search of a missing value (200000 nodes, best of 5):')
+tree = build_tree(BinaryTree(0), 200000)
+print('- stack methods  {:8.2f} ms'.format(best_of(search_methods, tree, -1)))
+print('- search_stack   {:8.2f} ms'.format(best_of(tree.search_stack, -1,
+                                                   tree.root)))
+
+print('\n==== Representation of a tree with 200000 nodes:')
+tree = build_tree(BinaryTree(0), 200000)
+start = perf_counter()
+repr(tree)
+elapsed = 1000.0 * (perf_counter() - start)
+print('- repr (short)       {:8.4f} ms'.format(elapsed))
+start = perf_counter()
+tree_info(tree.root)
+elapsed = 1000.0 * (perf_counter() - start)
+print('- tree_info          {:8.2f} ms'.format(elapsed))
+start = perf_counter()
+str(tree)
+elapsed = 1000.0 * (perf_counter() - start)
+print('- str (first call)   {:8.2f} ms'.format(elapsed))
+tree.add_left(-1, tree.root.left.left)
+start = perf_counter()
+str(tree)
+elapsed = 1000.0 * (perf_counter() - start)
+print('- str (after change) {:8.4f} ms'.format(elapsed))
+
+
+def remove_files(folder):
+    """
+    Removes all files in <folder>.
+    """
+    for name in os.listdir(folder):
+        os.remove(os.path.join(folder, name))
+
+
+print('\n==== Operation log of a tree with 200000 nodes:')
+folder = tempfile.mkdtemp()
+path = os.path.join(folder, 'tree.log')
+tree = build_tree(BinaryTree(0), 200000)
+start = perf_counter()
+pickle.dumps(tree)
+elapsed = 1000.0 * (perf_counter() - start)
+print('- full dump              {:10.2f} ms'.format(elapsed))
+for label, sync, changes in (('sync', True, 200), ('no sync', False, 20000)):
+    remove_files(folder)
+    log = TreeLog(path, sync=sync)
+    tree = log.open(build_tree(BinaryTree(0), 200000).root)
+    start = perf_counter()
+    for i in range(changes // 2):
+        node = tree.add_left(i, tree.root)
+        tree.change(-i, node)
+    elapsed = perf_counter() - start
+    print('- log ({:7s})          {:10.0f} records/s'
+          .format(label, changes / elapsed))
+    log.close()
+start = perf_counter()
+log = TreeLog(path)
+tree = log.open()
+elapsed = 1000.0 * (perf_counter() - start)
+print('- recovery ({:5d} records) {:8.2f} ms'.format(log.count, elapsed))
+start = perf_counter()
+log.compact()
+elapsed = 1000.0 * (perf_counter() - start)
+print('- compaction             {:10.2f} ms'.format(elapsed))
+log.close()
+remove_files(folder)
+os.rmdir(folder)
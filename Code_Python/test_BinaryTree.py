@@ -4,6 +4,9 @@ Test file for the binary tree data structure in file <BinaryTree.py>
 Copyright (c) 2021 Gabriele Gilardi
 """
 
+import copy
+import pickle
+
 from BinaryTree import *
 
 # Build the tree
@@ -39,6 +42,33 @@ print('\n==== Nodes [value, left child value, right child value, parent value]:'
 #  [9, None, None, 4], [10, None, None, 6], [11, None, None, 6]]
 print(tree_nodes(tree.root))
 
+print('\n==== Node values level by level:')
+# [0]
+# [1, 2]
+# [3, 4, 5, 6]
+# [7, 8, 9, 10, 11]
+for level in iter_levels(tree.root):
+    print([node.get_value() for node in level])
+
+print('\n==== Node values using in-order and successor/predecessor of n4:')
+# [7, 3, 8, 1, 4, 9, 0, 5, 2, 10, 6, 11]
+print([node.get_value() for node in iter_in(tree.root)])
+print('- successor:', successor(n4).get_value())        # 9
+print('- predecessor:', predecessor(n4).get_value())    # 1
+
+print('\n==== Limited info and nodes (top 2 levels, first 4 nodes):')
+print(tree_info(tree.root, max_depth=1))                # (3, 1)
+# [[0, 1, 2, None], [1, 3, 4, 0], [2, 5, 6, 0], [3, 7, 8, 1]]
+print(tree_nodes(tree.root, max_depth=2, max_nodes=4))
+print(tree.search(9, max_depth=2))                      # None
+print('- sample size:', len(sample_nodes(tree.root, 5)))   # 5
+
+print('\n==== Tree built using the node constructor:')
+built_tree = BinaryTree(BTnode(1, left=BTnode(0), right=BTnode(2)))
+print(built_tree.search(2, order='in').get_value())             # 2
+print([node.get_value() for node in iter_in(built_tree.root)])  # [0, 1, 2]
+print('- successor of 0:', successor(built_tree.root.left).get_value())   # 1
+
 print('\n==== Examples of checks:')
 print('- tree is empty:', tree.is_empty())          # False
 print('- node n3 is a leaf:', tree.is_leaf(n3))     # False
@@ -49,6 +79,11 @@ print(tree.search(10, order='pre'))     # Search 10 using pre-order
 print(tree.search(3, order='post'))     # Search 3 using post-order
 print(tree.search(5))                   # Search 5 using a qeueu
 
+print('\n==== Search many values with a single traversal:')
+# {5: [5, None, None, 2], 9: [9, None, None, 4], 42: None}
+batch = tree.search_batch([5, 9, 42], order='pre')
+print({value: node and node_info(node) for value, node in batch.items()})
+
 print('\n==== Examples of search in sub-trees:')
 print(tree.search_in(9, n1))        # Search 9 using in-order, start from n1
 print(tree.search_stack(11, n6))    # Search 11 using a stack, start from n6
@@ -113,7 +148,7 @@ print(tree)
 # - height = 4
 print(tree_nodes(tree.root))
 # [[0, 1, 2, None], [1, None, 4, 0], [2, 5, 20, 0], [4, None, 9, 1],
-#  [5, None, None, 2], [20, 3, None, 2], [9, None, None, 4], [3, 7, 8, 2],
+#  [5, None, None, 2], [20, 3, None, 2], [9, None, None, 4], [3, 7, 8, 20],
 #  [7, None, None, 3], [8, None, None, 3]]
 
 print('\n==== Create a new tree using n6 and print the tree info and nodes:')
@@ -126,6 +161,52 @@ print(new_tree)
 print(tree_nodes(new_tree.root))
 # [[6, 10, 11, None], [10, None, None, 6], [11, None, None, 6]]
 
+print('\n==== Compare trees and look for sub-trees:')
+other_tree = BinaryTree(6)
+other_tree.add_left(10, other_tree.root)
+m11 = other_tree.add_right(11, other_tree.root)
+print('- trees are identical:', new_tree == other_tree)         # True
+print('- sub-tree n3 in the tree:', n3 in tree)                 # True
+print('- value 9 in the tree:', 9 in tree)                      # True
+m11.set_value(12)
+print('- trees are identical:', new_tree == other_tree)         # False
+print('- sub-tree n6 in the tree:', n6 in tree)                 # False
+print('- trees with lists are identical:',
+      BinaryTree([1]) == BinaryTree([1]))                       # True
+
+print('\n==== Differences between two trees:')
+other_tree.add_left(13, m11)
+script = new_tree.diff(other_tree)
+# [('change', 'R', 12), ('insert', 'RL', [13], b'\x00')]
+print(script)
+new_tree.apply_patch(script)
+print('- trees are identical:', new_tree == other_tree)         # True
+# hash(-1) == hash(-2), so the sub-tree hashes are the same
+tree_a = BinaryTree(0)
+tree_a.add_left(-1, tree_a.root)
+tree_b = BinaryTree(0)
+tree_b.add_left(-2, tree_b.root)
+print(tree_a.diff(tree_b))                      # [('change', 'L', -2)]
+tree_a.apply_patch(tree_a.diff(tree_b))
+print('- trees are identical:', tree_a == tree_b)               # True
+try:
+    tree_a.apply_patch([('change', 'LL', 5)])   # No node at path 'LL'
+except ValueError as error:
+    print('- error:', error)                    # no node at path 'LL'
+
+print('\n==== Copy and pickle the tree:')
+copy_tree = tree.copy()
+print('- copy is identical:', copy_tree == tree)                 # True
+pickled_tree, pickled_n4 = pickle.loads(pickle.dumps((tree, n4)))
+print('- pickle is identical:', pickled_tree == tree)           # True
+print('- node n4 path:', pickled_tree.node_at('LR') is pickled_n4)  # True
+n4_copy = copy.copy(n4)
+print('- shallow copy shares links:',
+      n4_copy is not n4 and n4_copy.parent is n4.parent)      # True
+n4_deep = copy.deepcopy(n4)                     # Copies the entire tree
+print('- deep copy tree is identical:',
+      BinaryTree(n4_deep.parent.parent) == tree)                # True
+
 print('\n==== Clear the tree and print the tree info and nodes:')
 tree.clear()
 print(tree)
@@ -135,3 +216,58 @@ print(tree)
 # - height = 0
 print(tree_nodes(tree.root))
 # [[0, None, None, None]]
+
+print('\n==== Recycle nodes using a node pool:')
+pool = NodePool(max_size=100)
+pool_tree = BinaryTree(0, pool=pool)
+p1 = pool_tree.add_left(1, pool_tree.root)
+p2 = pool_tree.add_left(2, p1)
+p3 = pool_tree.add_right(3, pool_tree.root)
+pool_tree.clear(release=True)
+print(pool)
+# NodePool object
+# - recycled nodes = 3
+# - max size = 100
+p4 = pool_tree.add_left(4, pool_tree.root)
+# Released nodes must not be used anymore
+print('- released node reused:', p4 in (p1, p2, p3))   # True
+print('- recycled nodes left:', len(pool.nodes))        # 2
+print(tree_nodes(pool_tree.root))
+# [[0, 4, None, None], [4, None, None, 0]]
+
+print('\n==== Remove a sub-tree unlinking its nodes:')
+gc_tree = BinaryTree(0, gc_mode='off')
+g1 = gc_tree.add_left(1, gc_tree.root)
+g2 = gc_tree.add_left(2, g1)
+gc_tree.remove(g1, unlink=True)
+print(tree_nodes(gc_tree.root))                     # [[0, None, None, None]]
+print('- node g2 parent:', g2.get_parent())         # None
+
+print('\n==== Range, path, and nearest value in an ordered tree:')
+#
+#                   8
+#         4                  12
+#    2         6        10        14
+#
+ordered_tree = BinaryTree(8)
+o4 = ordered_tree.add_left(4, ordered_tree.root)
+o12 = ordered_tree.add_right(12, ordered_tree.root)
+ordered_tree.add_left(2, o4)
+ordered_tree.add_right(6, o4)
+ordered_tree.add_left(10, o12)
+ordered_tree.add_right(14, o12)
+nodes = ordered_tree.iter_range(5, 11)
+print([node.get_value() for node in nodes])                      # [6, 8, 10]
+print([node.get_value() for node in ordered_tree.path(10)])       # [8, 12, 10]
+print('- nearest to 13:', ordered_tree.nearest(13).get_value())   # 12
+word_tree = BinaryTree('m')
+word_tree.add_left('c', word_tree.root)
+word_tree.add_right('x', word_tree.root)
+print('- nearest to "d":', word_tree.nearest('d').get_value())     # c
+
+print('\n==== Short representations and information of many nodes:')
+print(repr(ordered_tree.root))                      # BTnode(8)
+print(repr(ordered_tree))                           # size = unknown
+print(ordered_tree.summary(verbose=True))           # size = 7, height = 2
+# ([4, 12], [2, 10], [6, 14], [8, 8])
+print(node_info_batch([o4, o12]))